@@ -1,34 +1,15 @@
 import streamlit as st
-import google.generativeai as genai
-import speech_recognition as sr
-from gtts import gTTS
-from io import BytesIO
-import os
-import base64
-import streamlit.components.v1 as components
-import pyttsx3
-import tempfile
+from sumnotes import calls
+from sumnotes.conversation import Conversation, model_compactor
+from sumnotes.models import get_model
+from sumnotes.llm import iter_response_text
+from sumnotes.voice import discard_speech_capture, get_speech_capture, show_live_transcript, speak_stream, speak_text
 
 # ----------------- Page & API Configuration -----------------
 st.set_page_config(page_title="AI Buddy - SumNotes", page_icon="🤖", layout="wide")
 
-# ----------------- API Configuration -----------------
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "Your API Key")
-genai.configure(api_key=GEMINI_API_KEY)
-
 # ----------------- Model Initialization -----------------
-generation_config = {
-    "temperature": 1.7,
-    "top_p": 0.95,
-    "top_k": 64,
-    "max_output_tokens": 65535,
-    "response_mime_type": "text/plain",
-}
-
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-thinking-exp-01-21",
-    generation_config=generation_config,
-)
+model = get_model("chat")
 
 # ----------------- Shared CSS -----------------
 st.markdown("""
@@ -163,85 +144,84 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# ----------------- Voice Processing with gTTS -----------------
-class VoiceProcessor:
-    @staticmethod
-    def text_to_speech_bytes(text, lang='en'):
-        try:
-            tts = gTTS(text=text, lang=lang, slow=False)
-            fp = BytesIO()
-            tts.write_to_fp(fp)
-            fp.seek(0)
-            return fp.read()
-        except Exception as e:
-            st.error(f"Error converting text to speech (gTTS): {e}")
-            return None
+# ----------------- Conversation Memory -----------------
+# Tokens of recent conversation sent with each message; older turns are summarized
+BUDDY_HISTORY_TOKENS = 6000
+# Messages kept (and re-rendered) in the on-screen chat log
+CHAT_LOG_LIMIT = 50
 
-    @staticmethod
-    def record_audio():
-        try:
-            r = sr.Recognizer()
-            with sr.Microphone() as source:
-                st.info("Listening... Please speak now.")
-                audio = r.listen(source, timeout=5, phrase_time_limit=10)
-                try:
-                    text = r.recognize_google(audio)
-                    return text
-                except sr.UnknownValueError:
-                    st.error("Could not understand the audio.")
-                    return None
-                except sr.RequestError as e:
-                    st.error(f"Error from speech recognition service: {e}")
-                    return None
-        except Exception as e:
-            st.error(f"Microphone error: {e}")
-            return None
-
-# ----------------- Pyttsx3 TTS Function -----------------
-def text_to_speech_pyttsx3(text, rate_multiplier):
-    try:
-        engine = pyttsx3.init()
-        default_rate = engine.getProperty('rate')
-        new_rate = int(default_rate * rate_multiplier)
-        engine.setProperty('rate', new_rate)
-        temp_file = tempfile.mktemp(suffix=".wav")
-        engine.save_to_file(text, temp_file)
-        engine.runAndWait()
-        with open(temp_file, "rb") as f:
-            audio_bytes = f.read()
-        os.remove(temp_file)
-        return audio_bytes
-    except Exception as e:
-        st.error(f"Error in pyttsx3 TTS: {e}")
-        return None
+def get_conversation():
+    if "buddy_conversation" not in st.session_state:
+        st.session_state.buddy_conversation = Conversation(
+            token_budget=BUDDY_HISTORY_TOKENS,
+            compact=model_compactor(model),
+        )
+    return st.session_state.buddy_conversation
 
-# ----------------- Function to Play Audio Hidden -----------------
-def play_audio_hidden(audio_bytes, playback_rate, mime_type="audio/mp3"):
-    if audio_bytes:
-        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-        audio_html = f"""
-        <audio id="audio-player" autoplay style="display:none">
-          <source src="data:{mime_type};base64,{audio_base64}" type="{mime_type}">
-        </audio>
-        <script>
-          var audio = document.getElementById("audio-player");
-          audio.playbackRate = {playback_rate};
-          audio.play();
-        </script>
-        """
-        components.html(audio_html, height=0)
+def add_chat_message(role, content):
+    st.session_state.chat_history.append({"role": role, "content": content})
+    del st.session_state.chat_history[:-CHAT_LOG_LIMIT]
 
 # ----------------- AI Answer Generation -----------------
+def build_prompt(question, ai_name):
+    return f"You are {ai_name}, a helpful AI assistant. The user asks: {question}\nPlease provide a clear, detailed answer."
+
 def get_answer_from_ai(question, ai_name):
-    model = genai.GenerativeModel(model_name="gemini-1.5-flash")
-    prompt = f"You are {ai_name}, a helpful AI assistant. The user asks: {question}\nPlease provide a clear, detailed answer."
+    conversation = get_conversation()
+    prompt = build_prompt(question, ai_name)
     try:
-        response = model.generate_content(prompt)
+        chat_session = model.start_chat(history=conversation.history())
+        response = calls.send_message(chat_session, prompt)
+        # Only the question itself is remembered, not the instructions around it
+        conversation.add_exchange(question, response.text)
         return response.text
     except Exception as e:
         st.error(f"Error generating answer: {e}")
         return None
 
+def stream_answer_from_ai(question, ai_name):
+    """
+    Yields the answer text as the model generates it. Whatever was received
+    is added to the conversation when the stream ends, even if it fails part
+    way, so the model sees the same history as the on-screen chat log.
+    """
+    conversation = get_conversation()
+    chat_session = model.start_chat(history=conversation.history())
+    parts = []
+    try:
+        for text in iter_response_text(calls.stream_message(chat_session, build_prompt(question, ai_name))):
+            parts.append(text)
+            yield text
+    finally:
+        if parts:
+            conversation.add_exchange(question, "".join(parts))
+
+def reply(user_input):
+    """
+    Answers user_input and speaks the answer. In streaming mode, speech starts
+    with the first sentence while the rest of the answer is still generating.
+    """
+    add_chat_message("user", user_input)
+    tts_engine = st.session_state.get("tts_engine", "gTTS")
+    voice_speed = st.session_state.get("voice_speed", 1.5)
+    if st.session_state.get("stream_voice", True):
+        placeholder = st.empty()
+        ai_response = ""
+        try:
+            for text in speak_stream(stream_answer_from_ai(user_input, st.session_state.ai_name), tts_engine, voice_speed):
+                ai_response += text
+                placeholder.markdown(ai_response)
+        except Exception as e:
+            st.error(f"Error generating answer: {e}")
+        if ai_response:
+            add_chat_message("assistant", ai_response)
+        return
+    with st.spinner(f"{st.session_state.ai_name} is thinking..."):
+        ai_response = get_answer_from_ai(user_input, st.session_state.ai_name)
+        if ai_response:
+            add_chat_message("assistant", ai_response)
+            speak_text(ai_response, tts_engine, voice_speed)
+
 # ----------------- Main Application -----------------
 def main():
 
@@ -300,6 +280,10 @@ def main():
         else:
             voice_speed = st.slider("Playback Speed (gTTS)", min_value=1.0, max_value=3.0, value=1.5, step=0.1)
             st.session_state["voice_speed"] = voice_speed
+        st.session_state["stream_voice"] = st.toggle(
+            "Start speaking while the answer is generated", value=True,
+            help="Speech begins with the first sentence instead of after the full answer.",
+        )
         st.markdown('</div>', unsafe_allow_html=True)
 
     with col2:
@@ -323,59 +307,59 @@ def main():
                 st.markdown(f"<p><b>{role}:</b> {message['content']}</p>", unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
+        if st.button("Clear Conversation", key="clear_conversation_button"):
+            st.session_state.chat_history = []
+            get_conversation().clear()
+            st.rerun()
+
         input_method = st.radio("Input method:", ["Text", "Voice"], horizontal=True)
 
         if input_method == "Text":
+            # Switching away from Voice mid-recording must not leave the microphone open
+            if st.session_state.recording:
+                discard_speech_capture()
+                st.session_state.recording = False
             with st.container():
                 col_input, col_button = st.columns([4, 1])
                 with col_input:
                     st.session_state.user_input = st.text_input("Type your message...", key="text_input_area", label_visibility="collapsed")
                 with col_button:
-                    if st.button("Send", key="send_button", type="primary", disabled=not st.session_state.user_input):
-                        user_input = st.session_state.user_input
-                        st.session_state.user_input = ""
-                        if user_input:
-                            st.session_state.chat_history.append({"role": "user", "content": user_input})
-                            with st.spinner(f"{st.session_state.ai_name} is thinking..."):
-                                ai_response = get_answer_from_ai(user_input, st.session_state.ai_name)
-                                if ai_response:
-                                    st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                                    if ai_response:
-                                        tts_engine = st.session_state.get("tts_engine", "gTTS")
-                                        voice_speed = st.session_state.get("voice_speed", 1.5)
-                                        if tts_engine == "gTTS":
-                                            audio_bytes = VoiceProcessor.text_to_speech_bytes(ai_response)
-                                            play_audio_hidden(audio_bytes, playback_rate=voice_speed, mime_type="audio/mp3")
-                                        else:
-                                            audio_bytes = text_to_speech_pyttsx3(ai_response, rate_multiplier=voice_speed)
-                                            play_audio_hidden(audio_bytes, playback_rate=1, mime_type="audio/wav")
+                    send = st.button("Send", key="send_button", type="primary", disabled=not st.session_state.user_input)
+            if send:
+                user_input = st.session_state.user_input
+                st.session_state.user_input = ""
+                if user_input:
+                    # Outside the narrow button column so the streamed answer has room
+                    reply(user_input)
 
         else:
+            capture = get_speech_capture()
             if st.session_state.recording:
                 if st.button("Stop Recording 🎤"):
                     st.session_state.recording = False
-                    recorded_text = VoiceProcessor.record_audio()
+                    with st.spinner("Finishing transcription..."):
+                        recorded_text = capture.stop()
+                    for error in capture.errors:
+                        st.error(error)
+                    st.session_state.pop("speech_capture")
                     if recorded_text:
                         user_input = recorded_text
                         if user_input:
-                            st.session_state.chat_history.append({"role": "user", "content": user_input})
-                            with st.spinner(f"{st.session_state.ai_name} is thinking..."):
-                                ai_response = get_answer_from_ai(user_input, st.session_state.ai_name)
-                                if ai_response:
-                                    st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                                    if ai_response:
-                                        tts_engine = st.session_state.get("tts_engine", "gTTS")
-                                        voice_speed = st.session_state.get("voice_speed", 1.5)
-                                        if tts_engine == "gTTS":
-                                            audio_bytes = VoiceProcessor.text_to_speech_bytes(ai_response)
-                                            play_audio_hidden(audio_bytes, playback_rate=voice_speed, mime_type="audio/mp3")
-                                        else:
-                                            audio_bytes = text_to_speech_pyttsx3(ai_response, rate_multiplier=voice_speed)
-                                            play_audio_hidden(audio_bytes, playback_rate=1, mime_type="audio/wav")
+                            reply(user_input)
+                    else:
+                        st.error("Could not understand the audio.")
+                else:
+                    show_live_transcript(capture)
             else:
                 if st.button("Start Recording 🎤"):
-                    st.session_state.recording = True
                     user_input = ""
+                    try:
+                        capture.start()
+                    except Exception as e:
+                        st.error(f"Microphone error: {e}")
+                    else:
+                        st.session_state.recording = True
+                        st.rerun()
 
     # Button to stop AI response with an icon
     if st.button("Stop AI Response", key="stop_response_button"):
@@ -1,10 +1,5 @@
 import streamlit as st
-import os
-import google.generativeai as genai
-from pathlib import Path
-import PyPDF2
-import io
-import docx  # Import the python-docx library
+from sumnotes import ingestion, ocr, pipelines
 
 # Page configuration
 st.set_page_config(page_title="Notes Generator - SumNotes", page_icon="✍️", layout="wide")
@@ -175,67 +170,35 @@ if 'chapter_text' not in st.session_state:
 if 'notes_history' not in st.session_state:
     st.session_state.notes_history = []
 
-# ----------------- API Configuration -----------------
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "Your API Key")
-genai.configure(api_key=GEMINI_API_KEY)
-
-# ----------------- Model Initialization -----------------
-generation_config = {
-    "temperature": 1.7,
-    "top_p": 0.95,
-    "top_k": 64,
-    "max_output_tokens": 65535,
-    "response_mime_type": "text/plain",
-}
-
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-thinking-exp-01-21",
-    generation_config=generation_config,
-)
-
-def extract_text_from_pdf(pdf_file, page_range):
+def extract_text_from_pdf(pdf_file, page_range, on_page=None):
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page_num in range(page_range[0]-1, page_range[1]):
-            text += pdf_reader.pages[page_num].extract_text() + "\n"
-        return text
+        pages = []
+        for page_num, page_text in ocr.iter_pdf_text(pdf_file, page_range):
+            pages.append(page_text)
+            if on_page:
+                on_page(page_num, page_text)
+        return "\n".join(pages)
     except Exception as e:
         return f"Error extracting text from PDF: {str(e)}"
 
 def extract_text_from_docx(docx_file):
     try:
-        doc = docx.Document(docx_file)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text
+        return ingestion.extract_docx_text(docx_file)
     except Exception as e:
         return f"Error extracting text from DOCX: {str(e)}"
 
-def generate_notes(text, custom_prompt=""):
-    default_prompt = """
-    Please analyze this book chapter and create comprehensive notes. Include:
-    1. Main themes and key concepts
-    2. Important points and arguments
-    3. Notable quotes or passages
-    4. Summary of the chapter
-    5. Key takeaways
-    """
-    prompt = custom_prompt if custom_prompt else default_prompt
-    prompt += f"\n\nChapter content: {text}"
-    
+def generate_notes(text, custom_prompt="", use_cache=True):
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return pipelines.make_notes(text, custom_prompt, use_cache=use_cache)
     except Exception as e:
-        return f"Error generating notes: {str(e)}"
+        st.error(f"Error generating notes: {str(e)}")
+        return None
+
+def stream_notes(text, custom_prompt="", use_cache=True):
+    return pipelines.stream_notes(text, custom_prompt, use_cache=use_cache)
 
 def save_notes(notes, filename):
-    notes_dir = Path("generated_notes")
-    notes_dir.mkdir(exist_ok=True)
-    file_path = notes_dir / f"{filename}.txt"
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(notes)
-    return file_path
+    return pipelines.save_output(notes, pipelines.NOTES_DIR, filename)
 
 def main():
     st.markdown('<div class="content-container">', unsafe_allow_html=True)
@@ -255,8 +218,7 @@ def main():
     elif input_method == "PDF Upload":
         uploaded_file = st.file_uploader("Upload PDF file", type="pdf")
         if uploaded_file is not None:
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            num_pages = len(pdf_reader.pages)
+            num_pages = ingestion.get_pdf_page_count(uploaded_file)
             
             st.write(f"PDF has {num_pages} pages")
             page_range = st.slider(
@@ -266,14 +228,25 @@ def main():
             )
             
             if st.button("Extract Text from PDF"):
-                with st.spinner("Extracting text from PDF..."):
-                    st.session_state.chapter_text = extract_text_from_pdf(uploaded_file, page_range)
-                    if st.session_state.chapter_text.startswith("Error"):
-                        st.error(st.session_state.chapter_text)
-                    else:
-                        st.success("Text extracted successfully!")
-                        with st.expander("Show extracted text"):
-                            st.text(st.session_state.chapter_text[:1000] + "...")
+                total_pages = page_range[1] - page_range[0] + 1
+                progress_bar = st.progress(0.0, text="Extracting text from PDF...")
+                preview = st.empty()
+
+                def show_progress(page_num, page_text):
+                    done = page_num - page_range[0] + 1
+                    progress_bar.progress(done / total_pages, text=f"Extracted page {page_num} of {page_range[1]}")
+                    if done == 1:
+                        # Show the first page as soon as it is ready
+                        preview.text(page_text[:1000] + "...")
+
+                st.session_state.chapter_text = extract_text_from_pdf(uploaded_file, page_range, on_page=show_progress)
+                if st.session_state.chapter_text.startswith("Error"):
+                    st.error(st.session_state.chapter_text)
+                else:
+                    st.success("Text extracted successfully!")
+                    preview.empty()
+                    with st.expander("Show extracted text"):
+                        st.text(st.session_state.chapter_text[:1000] + "...")
     elif input_method == "DOCX Upload":
         uploaded_file = st.file_uploader("Upload DOCX file", type="docx")
         if uploaded_file is not None:
@@ -302,34 +275,45 @@ def main():
         with st.expander("Current Text for Processing"):
             st.text(st.session_state.chapter_text[:500] + "...")
     
+    stream_output = st.toggle("Stream notes as they are generated", value=True)
+    use_cache = st.checkbox("Reuse previous result for identical requests", value=True)
+    
     if st.button("Generate Notes", type="primary"):
         if not st.session_state.chapter_text:
             st.error("Please enter text or upload a PDF or DOCX file.")
             return
             
-        with st.spinner("Generating notes... This may take a moment."):
-            notes = generate_notes(st.session_state.chapter_text, custom_prompt)
+        if stream_output:
+            st.markdown("### Generated Notes")
+            try:
+                notes = st.write_stream(stream_notes(st.session_state.chapter_text, custom_prompt, use_cache))
+            except Exception as e:
+                st.error(f"Error generating notes: {str(e)}")
+                notes = None
+        else:
+            with st.spinner("Generating notes... This may take a moment."):
+                notes = generate_notes(st.session_state.chapter_text, custom_prompt, use_cache)
             
-            if notes.startswith("Error"):
-                st.error(notes)
-            else:
-                st.success("Notes generated successfully!")
-                
-                if chapter_name:
-                    st.session_state.notes_history.append((chapter_name, notes))
-                
+        # Failures are reported above and never saved as if they were notes
+        if notes:
+            st.success("Notes generated successfully!")
+            
+            if chapter_name:
+                st.session_state.notes_history.append((chapter_name, notes))
+            
+            if not stream_output:
                 st.markdown("### Generated Notes")
                 st.markdown(notes)
-                
-                if chapter_name:
-                    file_path = save_notes(notes, chapter_name)
-                    st.download_button(
-                        label="Download Notes",
-                        data=notes,
-                        file_name=f"{chapter_name}_notes.txt",
-                        mime="text/plain"
-                    )
-                    st.info(f"Notes saved to: {file_path}")
+            
+            if chapter_name:
+                file_path = save_notes(notes, chapter_name)
+                st.download_button(
+                    label="Download Notes",
+                    data=notes,
+                    file_name=f"{chapter_name}_notes.txt",
+                    mime="text/plain"
+                )
+                st.info(f"Notes saved to: {file_path}")
     
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -1,60 +1,58 @@
-import streamlit as st
-import os
-import google.generativeai as genai
-from docx import Document
-import PyPDF2
+import json
 
-# ----------------- API Configuration -----------------
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "Your API Key")
-genai.configure(api_key=GEMINI_API_KEY)
+import streamlit as st
+from sumnotes.models import get_generation_config, get_model
+from sumnotes import calls, ingestion, ocr, pipelines
+from sumnotes.conversation import Conversation, model_compactor
+from sumnotes.llm import ResponseCache, response_cache
 
 # ----------------- Model Initialization -----------------
-generation_config = {
-    "temperature": 1.7,
-    "top_p": 0.95,
-    "top_k": 64,
-    "max_output_tokens": 65535,
-    "response_mime_type": "text/plain",
-}
-
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-thinking-exp-01-21",
-    generation_config=generation_config,
-)
-
-chat_session = model.start_chat(history=[])
-
-def predict_questions(subject, topics, num_questions, question_type, custom_prompt=None):
-    if custom_prompt:
-        prompt = custom_prompt
-    else:
-        prompt = f"""
-        You are an AI exam predictor. Generate {num_questions} {question_type} exam questions for the subject: {subject}.
-        Focus on the following topics: {topics}.
-        """
+generation_config = get_generation_config("study")
+model = get_model("study")
+
+# Prompt history sent with each request is capped at this many tokens
+QUESTION_HISTORY_TOKENS = 8000
+
+def get_conversation():
+    # Each browser session keeps its own bounded history; older turns are
+    # compacted into a summary by the fast chat model.
+    if "question_conversation" not in st.session_state:
+        st.session_state.question_conversation = Conversation(
+            token_budget=QUESTION_HISTORY_TOKENS,
+            compact=model_compactor(get_model("chat")),
+        )
+    return st.session_state.question_conversation
+
+def predict_questions(subject, topics, num_questions, question_type, custom_prompt=None, use_cache=True):
+    prompt = pipelines.build_questions_prompt(subject, topics, num_questions, question_type, custom_prompt)
     
+    conversation = get_conversation()
+
+    history = conversation.history()
+    # The answer depends on the earlier exchanges as well, so they are part of the key
+    cache_prompt = json.dumps(history) + prompt if history else prompt
+    key = ResponseCache.key(model.model_name, generation_config, cache_prompt)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            conversation.add_exchange(prompt, cached)
+            return cached
+
     try:
-        response = chat_session.send_message(prompt)
+        chat_session = model.start_chat(history=history)
+        response = calls.send_message(chat_session, prompt)
+        response_cache.put(key, response.text)
+        conversation.add_exchange(prompt, response.text)
         return response.text
     except Exception as e:
-        return f"Error generating questions: {str(e)}"
+        st.error(f"Error generating questions: {str(e)}")
+        return None
 
 def extract_text_from_docx(file):
-    doc = Document(file)
-    full_text = []
-    for para in doc.paragraphs:
-        full_text.append(para.text)
-    return ' '.join(full_text)
+    return ingestion.extract_docx_text(file, separator=' ')
 
 def extract_text_from_pdf(file, page_range=None):
-    pdf_reader = PyPDF2.PdfReader(file)
-    full_text = []
-    pages = pdf_reader.pages
-    if page_range:
-        pages = pages[page_range[0]-1:page_range[1]]
-    for page in pages:
-        full_text.append(page.extract_text())
-    return ' '.join(full_text)
+    return ocr.extract_pdf_text(file, page_range, separator=' ')
 
 # ----------------- Page Configuration -----------------
 st.set_page_config(page_title="Question Predictor - SumNotes", page_icon="❓", layout="wide")
@@ -177,7 +175,7 @@ else:
         if uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
             topics = extract_text_from_docx(uploaded_file)
         elif uploaded_file.type == "application/pdf":
-            num_pages = len(PyPDF2.PdfReader(uploaded_file).pages)
+            num_pages = ingestion.get_pdf_page_count(uploaded_file)
             st.write(f"PDF has {num_pages} pages")
             page_range = st.slider(
                 "Select page range",
@@ -195,13 +193,15 @@ question_type = st.selectbox("Select Question Type", ("Multiple Choice", "Short
 
 num_questions = st.number_input("Number of Questions", min_value=1, max_value=100, value=10)
 
+use_cache = st.checkbox("Reuse previous result for identical requests", value=True)
+
 # Button to generate questions
 if st.button("Generate Questions"):
     with st.spinner("Generating questions... This may take a moment."):
         if custom_prompt:
-            questions = predict_questions(subject, topics, num_questions, question_type, custom_prompt)
+            questions = predict_questions(subject, topics, num_questions, question_type, custom_prompt, use_cache=use_cache)
         elif subject and topics:
-            questions = predict_questions(subject, topics, num_questions, question_type)
+            questions = predict_questions(subject, topics, num_questions, question_type, use_cache=use_cache)
         else:
             st.warning("Please provide subject and topics or a custom prompt.")
             questions = None
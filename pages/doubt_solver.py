@@ -1,42 +1,15 @@
 import streamlit as st
-import google.generativeai as genai
-from PIL import Image
-import pytesseract
-import numpy as np
-import cv2
-import os
-import speech_recognition as sr
-from gtts import gTTS
-from pdf2image import convert_from_path
-from io import BytesIO
-import base64
-import streamlit.components.v1 as components
-import pyttsx3
-import tempfile
+from sumnotes import calls
+from sumnotes.models import get_model
+from sumnotes.ingestion import get_pdf_page_count
+from sumnotes.ocr import OCRProcessor, extract_pdf_text, make_thumbnail
+from sumnotes.voice import discard_speech_capture, get_speech_capture, show_live_transcript, speak_text
 
 # ----------------- Page & API Configuration -----------------
 st.set_page_config(page_title="Doubt Solver - SumNotes", page_icon="🤷‍♂️", layout="wide")
 
-# ----------------- API Configuration -----------------
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "Your API Key")
-genai.configure(api_key=GEMINI_API_KEY)
-
 # ----------------- Model Initialization -----------------
-generation_config = {
-    "temperature": 1.7,
-    "top_p": 0.95,
-    "top_k": 64,
-    "max_output_tokens": 65535,
-    "response_mime_type": "text/plain",
-}
-
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-thinking-exp-01-21",
-    generation_config=generation_config,
-)
-
-# Set Tesseract Path default (You might need to change this)
-pytesseract.pytesseract.tesseract_cmd = r"C:/Program Files/Tesseract-OCR/tesseract.exe" 
+model = get_model("study")
 
 # ----------------- Custom CSS -----------------
 st.markdown("""
@@ -186,124 +159,28 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# ----------------- OCR Processing -----------------
-class OCRProcessor:
-    @staticmethod
-    def preprocess_image(image):
-        np_image = np.array(image)
-        gray = cv2.cvtColor(np_image, cv2.COLOR_BGR2GRAY)
-        # Apply Otsu's thresholding
-        gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        # Dilate to connect text components
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        gray = cv2.dilate(gray, kernel, iterations=1)
-        return gray
-
-    @staticmethod
-    def process_image(image_file):
-        try:
-            image = Image.open(image_file)
-            processed_image = OCRProcessor.preprocess_image(image)
-            text = pytesseract.image_to_string(processed_image, config='--oem 3 --psm 6')
-            return text, processed_image
-        except Exception as e:
-            st.error(f"Error processing image: {e}")
-            return None, None
-
-# ----------------- Voice Processing with gTTS -----------------
-class VoiceProcessor:
-    @staticmethod
-    def text_to_speech_bytes(text, lang='en'):
-        """
-        Converts text to speech using gTTS and returns the audio bytes.
-        """
-        try:
-            tts = gTTS(text=text, lang=lang, slow=False)
-            fp = BytesIO()
-            tts.write_to_fp(fp)
-            fp.seek(0)
-            return fp.read()
-        except Exception as e:
-            st.error(f"Error converting text to speech (gTTS): {e}")
-            return None
-
-    @staticmethod
-    def record_audio():
-        """
-        Records audio from the microphone and converts it to text.
-        """
-        try:
-            r = sr.Recognizer()
-            with sr.Microphone() as source:
-                st.info("Listening... Please speak now.")
-                audio = r.listen(source, timeout=5, phrase_time_limit=10)
-                try:
-                    text = r.recognize_google(audio)
-                    return text
-                except sr.UnknownValueError:
-                    st.error("Could not understand the audio.")
-                    return None
-                except sr.RequestError as e:
-                    st.error(f"Error from speech recognition service: {e}")
-                    return None
-        except Exception as e:
-            st.error(f"Microphone error: {e}")
-            return None
-
-# ----------------- Pyttsx3 TTS Function -----------------
-def text_to_speech_pyttsx3(text, rate_multiplier):
-    """
-    Uses pyttsx3 to convert text to speech, saves the output as a temporary WAV file,
-    then returns the file's audio bytes.
-    """
-    try:
-        engine = pyttsx3.init()
-        default_rate = engine.getProperty('rate')  # Typically around 200 wpm
-        new_rate = int(default_rate * rate_multiplier)
-        engine.setProperty('rate', new_rate)
-        temp_file = tempfile.mktemp(suffix=".wav")
-        engine.save_to_file(text, temp_file)
-        engine.runAndWait()
-        with open(temp_file, "rb") as f:
-            audio_bytes = f.read()
-        os.remove(temp_file)
-        return audio_bytes
-    except Exception as e:
-        st.error(f"Error in pyttsx3 TTS: {e}")
-        return None
-
-# ----------------- Function to Play Audio Hidden -----------------
-def play_audio_hidden(audio_bytes, playback_rate, mime_type="audio/mp3"):
-    """
-    Embeds a hidden HTML audio element that autoplays the provided audio bytes.
-    The playback_rate is applied via JavaScript (for gTTS/MP3).
-    For pyttsx3 (WAV), we keep playbackRate=1 because the audio is pre-rendered.
-    """
-    if audio_bytes:
-        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-        audio_html = f"""
-        <audio id="audio-player" autoplay style="display:none">
-          <source src="data:{mime_type};base64,{audio_base64}" type="{mime_type}">
-        </audio>
-        <script>
-          var audio = document.getElementById("audio-player");
-          audio.playbackRate = {playback_rate};
-          audio.play();
-        </script>
-        """
-        components.html(audio_html, height=0)
-
 # ----------------- AI Answer Generation -----------------
 def get_answer_from_ai(question, context=""):
     chat_session = model.start_chat(history=[])
     prompt = f"Question: {question}\nContext: {context}\nPlease provide a clear, detailed answer."
     try:
-        response = chat_session.send_message(prompt)
+        response = calls.send_message(chat_session, prompt)
         return response.text
     except Exception as e:
         st.error(f"Error generating answer: {e}")
         return None
 
+# ----------------- OCR Text -----------------
+def show_extracted_text(uploaded_file):
+    # Extracted text is kept in session state so "Use as Question" still has it
+    # on the rerun its own click triggers.
+    name, text = st.session_state.get("ocr_text", (None, None))
+    if text and name == uploaded_file.name:
+        st.code(text)
+        if st.button("Use as Question"):
+            st.session_state.ocr_question = text
+            st.rerun()
+
 # ----------------- Main Application -----------------
 def main():
     # Main content
@@ -320,17 +197,41 @@ def main():
     
     # ----- Tab 1: Text & Voice Input -----
     with tab1:
-        input_method = st.radio("Choose input method:", ["Text", "Voice"])
+        # Text picked with "Use as Question" on the OCR tab lands in the typed question
+        if "ocr_question" in st.session_state:
+            st.session_state.input_method = "Text"
+            st.session_state.typed_question = st.session_state.pop("ocr_question")
+        input_method = st.radio("Choose input method:", ["Text", "Voice"], key="input_method")
         question = ""
         if input_method == "Text":
-            question = st.text_area("Type your question here", height=100)
+            # Release the microphone if a recording was left running in Voice mode
+            discard_speech_capture()
+            question = st.text_area("Type your question here", height=100, key="typed_question")
         else:
             st.markdown('<div class="voice-controls"><h4>Voice Input Controls</h4></div>', unsafe_allow_html=True)
-            if st.button("🎤 Start Recording"):
-                recorded_text = VoiceProcessor.record_audio()
-                if recorded_text:
-                    st.session_state.recorded_question = recorded_text
-                    st.success(f"Recorded: {recorded_text}")
+            capture = get_speech_capture()
+            if not capture.listening:
+                if st.button("🎤 Start Recording"):
+                    try:
+                        capture.start()
+                    except Exception as e:
+                        st.error(f"Microphone error: {e}")
+                    else:
+                        st.rerun()
+            else:
+                if st.button("⏹️ Stop Recording"):
+                    with st.spinner("Finishing transcription..."):
+                        recorded_text = capture.stop()
+                    for error in capture.errors:
+                        st.error(error)
+                    if recorded_text:
+                        st.session_state.recorded_question = recorded_text
+                        st.success(f"Recorded: {recorded_text}")
+                    else:
+                        st.error("Could not understand the audio.")
+                    st.session_state.pop("speech_capture")
+                else:
+                    show_live_transcript(capture)
             # Display recorded question for review/editing.
             question = st.text_area("Recorded Question", value=st.session_state.get("recorded_question", ""), height=100)
         
@@ -346,8 +247,7 @@ def main():
                         st.write(answer)
                         # Use pyttsx3 for TTS by default
                         voice_speed = st.session_state.get("voice_speed", 1.0) # Default speed
-                        audio_bytes = text_to_speech_pyttsx3(answer, rate_multiplier=voice_speed)
-                        play_audio_hidden(audio_bytes, playback_rate=1, mime_type="audio/wav")
+                        speak_text(answer, "pyttsx3", voice_speed)
                         st.markdown('</div>', unsafe_allow_html=True)
             else:
                 st.error("Please provide a question (either type or record one).")
@@ -355,21 +255,42 @@ def main():
     # ----- Tab 2: OCR -----
     with tab2:
         uploaded_file = st.file_uploader("Upload an image", type=['png', 'jpg', 'jpeg', 'pdf'])
-        if uploaded_file:
+        if uploaded_file and uploaded_file.type == "application/pdf":
+            page_count = get_pdf_page_count(uploaded_file)
+            st.markdown(f"<h3> PDF ({page_count} pages) </h3>", unsafe_allow_html=True)
+            page_range = (1, 1)
+            if page_count > 1:
+                page_range = st.slider("Select page range", 1, page_count, (1, min(page_count, 5)))
+            if st.button("Extract Text"):
+                total = page_range[1] - page_range[0] + 1
+                progress_bar = st.progress(0, text="Extracting text...")
+                done = []
+
+                def show_page(page_num, page_text):
+                    done.append(page_num)
+                    progress_bar.progress(len(done) / total, text=f"Extracted {len(done)} of {total} pages")
+                    with st.expander(f"Page {page_num}"):
+                        st.text(page_text)
+
+                try:
+                    text = extract_pdf_text(uploaded_file, page_range, on_page=show_page)
+                except Exception as e:
+                    st.error(f"Error processing PDF: {e}")
+                    text = None
+                progress_bar.empty()
+                st.session_state.ocr_text = (uploaded_file.name, text)
+            show_extracted_text(uploaded_file)
+        elif uploaded_file:
             col1, col2 = st.columns(2)
             with col1:
                 st.markdown("<h3> Original Image </h3>", unsafe_allow_html=True)
-                image = Image.open(uploaded_file)
-                st.image(image, use_column_width=True)
+                st.image(make_thumbnail(uploaded_file), use_column_width=True)
             with col2:
                 st.markdown("<h3> Processed Text </h3>", unsafe_allow_html=True)
                 if st.button("Extract Text"):
                     text, _ = OCRProcessor.process_image(uploaded_file)
-                    if text:
-                        st.code(text)
-                        if st.button("Use as Question"):
-                            st.session_state.question = text
-                            st.experimental_rerun()
+                    st.session_state.ocr_text = (uploaded_file.name, text)
+                show_extracted_text(uploaded_file)
 
     st.markdown('</div>', unsafe_allow_html=True) # Close input-container
     st.markdown('</div>', unsafe_allow_html=True) # Close content-container
@@ -1,44 +1,24 @@
 import streamlit as st
-import google.generativeai as genai
-from PyPDF2 import PdfReader
-from docx import Document
-import os
+from sumnotes import ingestion, ocr
+from sumnotes.llm import generate_text
+from sumnotes.models import get_generation_config, get_model
 import graphviz
 
 # ----------------- Function Definitions -----------------
 
 def extract_text_from_pdf(file, start_page, end_page):
-    reader = PdfReader(file)
-    text = ""
-    for page_number in range(start_page - 1, end_page):
-        page = reader.pages[page_number]
-        text += page.extract_text() + "\n"
-    return text
+    try:
+        return ocr.extract_pdf_text(file, (start_page, end_page))
+    except Exception as e:
+        st.error(f"Error reading PDF: {e}")
+        return ""
 
 def extract_text_from_docx(file):
-    doc = Document(file)
-    full_text = []
-    for para in doc.paragraphs:
-        full_text.append(para.text)
-    return "\n".join(full_text)
-
-def generate_mind_map(topic, description, study_plan, timeframe):
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "Your API Key")
-    genai.configure(api_key=GEMINI_API_KEY)
-    generation_config = {
-        "temperature": 1.6,
-        "top_p": 0.95,
-        "top_k": 64,
-        "max_output_tokens": 8192,
-        "response_mime_type": "application/json",
-    }
-
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-pro-exp-02-05",
-        generation_config=generation_config,
-    )
-
-    chat_session = model.start_chat(history=[])
+    return ingestion.extract_docx_text(file)
+
+def generate_mind_map(topic, description, study_plan, timeframe, use_cache=True):
+    model = get_model("mind_map")
+    generation_config = get_generation_config("mind_map")
 
     prompt = f"""
     Generate a mind map for the following topic:
@@ -54,8 +34,7 @@ def generate_mind_map(topic, description, study_plan, timeframe):
     """
 
     try:
-        response = chat_session.send_message(prompt)
-        return response.text
+        return generate_text(model, prompt, generation_config, use_cache=use_cache)
     except Exception as e:
         st.error(f"Error generating mind map: {e}")
         return None
@@ -291,11 +270,12 @@ def main():
                 study_plan = st.text_area("Study Plan", placeholder="Outline your study plan...")
                 timeframe = st.text_input("Timeframe", placeholder="Enter the timeframe...")
 
+        use_cache = st.checkbox("Reuse previous result for identical requests", value=True)
         submit_button = st.button(label="Generate Mind Map")
 
     if submit_button:
         st.info("Generating Mind Map...")
-        mind_map_text = generate_mind_map(topic, description, study_plan, timeframe)
+        mind_map_text = generate_mind_map(topic, description, study_plan, timeframe, use_cache=use_cache)
         
         if mind_map_text:
             st.success("Mind Map Generated!")
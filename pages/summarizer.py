@@ -1,17 +1,15 @@
 import streamlit as st
-import os
-import google.generativeai as genai
-from pathlib import Path
-import PyPDF2
-import io
+from sumnotes import ingestion, ocr, pipelines
+from sumnotes.summarize import SINGLE_PROMPT_CHARS
 
-def extract_text_from_pdf(pdf_file, page_range):
+def extract_text_from_pdf(pdf_file, page_range, on_page=None):
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page_num in range(page_range[0]-1, page_range[1]):
-            text += pdf_reader.pages[page_num].extract_text() + "\n"
-        return text
+        pages = []
+        for page_num, page_text in ocr.iter_pdf_text(pdf_file, page_range):
+            pages.append(page_text)
+            if on_page:
+                on_page(page_num, page_text)
+        return "\n".join(pages)
     except Exception as e:
         return f"Error extracting text from PDF: {str(e)}"
 
@@ -129,51 +127,19 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ----------------- API Configuration -----------------
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "Your API Key")
-genai.configure(api_key=GEMINI_API_KEY)
-
-# ----------------- Model Initialization -----------------
-generation_config = {
-    "temperature": 1.7,
-    "top_p": 0.95,
-    "top_k": 64,
-    "max_output_tokens": 65535,
-    "response_mime_type": "text/plain",
-}
-
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-thinking-exp-01-21",
-    generation_config=generation_config,
-)
-
-
-
 # Modify the generate_notes function for summarization
-def generate_summary(text, summary_length, custom_prompt=""): 
-    default_prompt = f"""
-    Please summarize the following text, focusing on the main points and key takeaways. 
-    The summary should be approximately {summary_length}% of the original text.
-    """
-    
-    prompt = custom_prompt if custom_prompt else default_prompt
-    
-    prompt += f"\n\nText to summarize: {text}"
-    
+def generate_summary(text, summary_length, custom_prompt="", on_progress=None, use_cache=True): 
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return pipelines.summarize(text, summary_length, custom_prompt, on_progress=on_progress, use_cache=use_cache)
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
+        st.error(f"Error generating summary: {str(e)}")
+        return None
+
+def stream_summary(text, summary_length, custom_prompt="", use_cache=True):
+    return pipelines.stream_summary(text, summary_length, custom_prompt, use_cache=use_cache)
 
 def save_summary(summary, filename):
-    summary_dir = Path("generated_summaries") # New directory for summaries
-    summary_dir.mkdir(exist_ok=True)
-    
-    file_path = summary_dir / f"{filename}.txt"
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(summary)
-    return file_path
+    return pipelines.save_output(summary, pipelines.SUMMARY_DIR, filename)
 
 
 # ----------------- Navigation Bar -----------------
@@ -267,8 +233,7 @@ def main():
         uploaded_file = st.file_uploader("Upload PDF file", type="pdf")
         if uploaded_file is not None:
             # Add PDF page selection
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            num_pages = len(pdf_reader.pages)
+            num_pages = ingestion.get_pdf_page_count(uploaded_file)
             
             st.write(f"PDF has {num_pages} pages")
             page_range = st.slider(
@@ -278,17 +243,28 @@ def main():
             )
             
             if st.button("Extract Text from PDF"):
-                with st.spinner("Extracting text from PDF..."):
-                    # Extract text and store in session state
-                    st.session_state.chapter_text = extract_text_from_pdf(uploaded_file, page_range)
+                total_pages = page_range[1] - page_range[0] + 1
+                progress_bar = st.progress(0.0, text="Extracting text from PDF...")
+                preview = st.empty()
+
+                def show_progress(page_num, page_text):
+                    done = page_num - page_range[0] + 1
+                    progress_bar.progress(done / total_pages, text=f"Extracted page {page_num} of {page_range[1]}")
+                    if done == 1:
+                        # Show the first page as soon as it is ready
+                        preview.text(page_text[:1000] + "...")
+
+                # Extract text and store in session state
+                st.session_state.chapter_text = extract_text_from_pdf(uploaded_file, page_range, on_page=show_progress)
                     
-                    if st.session_state.chapter_text.startswith("Error"):
-                        st.error(st.session_state.chapter_text)
-                    else:
-                        st.success("Text extracted successfully!")
-                        # Show preview of extracted text
-                        with st.expander("Show extracted text"):
-                            st.text(st.session_state.chapter_text[:1000] + "...")
+                if st.session_state.chapter_text.startswith("Error"):
+                    st.error(st.session_state.chapter_text)
+                else:
+                    st.success("Text extracted successfully!")
+                    # Show preview of extracted text
+                    preview.empty()
+                    with st.expander("Show extracted text"):
+                        st.text(st.session_state.chapter_text[:1000] + "...")
 
     # Chapter/Document name input
     document_name = st.text_input( 
@@ -308,6 +284,10 @@ def main():
         help="Leave blank to use the default prompt"
     )
 
+    # Show the summary while it is being written instead of after it finishes
+    stream_output = st.toggle("Stream summary as it is generated", value=True)
+    use_cache = st.checkbox("Reuse previous result for identical requests", value=True)
+
     # Generate button
     if st.button("Generate Summary", type="primary"):
         if not st.session_state.chapter_text:
@@ -322,34 +302,51 @@ def main():
         else:
             length_percentage = 45
             
-        with st.spinner("Generating summary... This may take a moment."):
-            summary = generate_summary(st.session_state.chapter_text, length_percentage, custom_prompt)
+        streamed = stream_output and len(st.session_state.chapter_text) <= SINGLE_PROMPT_CHARS
+        if streamed:
+            st.markdown('<div class="notes-output">', unsafe_allow_html=True) 
+            st.header("Generated Summary")
+            try:
+                summary = st.write_stream(stream_summary(st.session_state.chapter_text, length_percentage, custom_prompt, use_cache))
+            except Exception as e:
+                st.error(f"Error generating summary: {str(e)}")
+                summary = None
+        else:
+            with st.spinner("Generating summary... This may take a moment."):
+                progress_bar = st.empty()
+
+                def show_progress(stage, done, total):
+                    label = "Summarizing sections" if stage == "map" else "Merging section summaries"
+                    progress_bar.progress(done / total, text=f"{label}: {done} of {total}")
+
+                summary = generate_summary(st.session_state.chapter_text, length_percentage, custom_prompt, on_progress=show_progress, use_cache=use_cache)
+                progress_bar.empty()
+            
+        # Failures are reported above and never saved as if they were a summary
+        if summary:
+            st.success("Summary generated successfully!")
             
-            if summary.startswith("Error"):
-                st.error(summary)
-            else:
-                st.success("Summary generated successfully!")
-                
-                # Add to history
-                if document_name:
-                    st.session_state.notes_history.append((document_name, summary))
-                
-                # Display summary in the output section with adjusted spacing
+            # Add to history
+            if document_name:
+                st.session_state.notes_history.append((document_name, summary))
+            
+            # Display summary in the output section with adjusted spacing
+            if not streamed:
                 st.markdown('<div class="notes-output">', unsafe_allow_html=True) 
                 st.header("Generated Summary")
                 st.markdown(summary)
-                
-                # Save summary
-                if document_name:
-                    file_path = save_summary(summary, document_name)
-                    st.download_button(
-                        label="Download Summary",
-                        data=summary,
-                        file_name=f"{document_name}_summary.txt",
-                        mime="text/plain"
-                    )
-                    st.info(f"Summary saved to: {file_path}")
-                st.markdown('</div>', unsafe_allow_html=True)
+            
+            # Save summary
+            if document_name:
+                file_path = save_summary(summary, document_name)
+                st.download_button(
+                    label="Download Summary",
+                    data=summary,
+                    file_name=f"{document_name}_summary.txt",
+                    mime="text/plain"
+                )
+                st.info(f"Summary saved to: {file_path}")
+            st.markdown('</div>', unsafe_allow_html=True)
 
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -0,0 +1,173 @@
+"""
+Headless batch generation of summaries, notes and exam questions.
+
+Walks a directory of PDF/DOCX/TXT files, runs the chosen pipelines with a
+bounded number of concurrent model calls (--concurrency documents at a time,
+sharing MAX_CONCURRENT_CHUNKS chunk calls between them) and writes results to
+generated_summaries/, generated_notes/ and generated_questions/. Finished work
+is recorded in a manifest, so an interrupted run picks up where it stopped.
+
+    python -m sumnotes.batch COURSE_DIR --pipelines summary notes --concurrency 4
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from sumnotes import ingestion, ocr, pipelines
+from sumnotes.cache import content_hash
+from sumnotes.summarize import MAX_CONCURRENT_CHUNKS
+
+SUPPORTED_SUFFIXES = {".pdf", ".docx", ".txt", ".md"}
+MANIFEST_NAME = ".sumnotes_batch.json"
+
+
+def find_documents(root, exclude=()):
+    """
+    Returns the supported files under root, skipping anything inside the
+    exclude directories (earlier outputs written alongside the inputs).
+    """
+    exclude = [Path(directory).resolve() for directory in exclude]
+    return sorted(
+        path for path in Path(root).rglob("*")
+        if path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES
+        and not any(path.resolve().is_relative_to(directory) for directory in exclude)
+    )
+
+
+def read_document(path):
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        return ocr.extract_pdf_text(path)
+    if suffix == ".docx":
+        return ingestion.extract_docx_text(path)
+    return path.read_text(encoding="utf-8", errors="replace")
+
+
+def output_name(root, path):
+    # Flatten sub-directories so same-named files in different folders don't collide
+    return "__".join(path.relative_to(root).with_suffix("").parts)
+
+
+# ----------------- Pipelines -----------------
+def _summary(text, args):
+    # Documents summarized at once split the chunk calls between them
+    max_workers = max(1, MAX_CONCURRENT_CHUNKS // args.concurrency)
+    return pipelines.summarize(text, args.length, args.custom_prompt, use_cache=not args.no_cache,
+                               max_workers=max_workers)
+
+
+def _notes(text, args):
+    return pipelines.make_notes(text, args.custom_prompt, use_cache=not args.no_cache)
+
+
+def _questions(text, args):
+    return pipelines.make_questions(
+        "From Uploaded Document", text, args.questions, args.question_type,
+        args.custom_prompt or None, use_cache=not args.no_cache,
+    )
+
+
+PIPELINES = {
+    "summary": (_summary, pipelines.SUMMARY_DIR),
+    "notes": (_notes, pipelines.NOTES_DIR),
+    "questions": (_questions, pipelines.QUESTIONS_DIR),
+}
+
+
+# ----------------- Progress Manifest -----------------
+class Manifest:
+    """
+    Records, per document and pipeline, the content hash that was last processed.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_done(self, document, pipeline, digest):
+        with self._lock:
+            return self.entries.get(document, {}).get(pipeline) == digest
+
+    def mark_done(self, document, pipeline, digest):
+        with self._lock:
+            self.entries.setdefault(document, {})[pipeline] = digest
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+            tmp_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+
+
+def _run_task(root, path, pipeline, args, output_root):
+    generate, directory = PIPELINES[pipeline]
+    result = generate(read_document(path), args)
+    return pipelines.save_output(result, output_root / directory, output_name(root, path))
+
+
+def run_batch(args):
+    root = Path(args.directory)
+    output_root = Path(args.output)
+    manifest = Manifest(output_root / MANIFEST_NAME)
+
+    tasks = []
+    skipped = 0
+    outputs = [output_root / directory for _, directory in PIPELINES.values()]
+    for path in find_documents(root, exclude=outputs):
+        digest = content_hash(ingestion.read_upload(path))
+        document = path.relative_to(root).as_posix()
+        for pipeline in args.pipelines:
+            output = output_root / PIPELINES[pipeline][1] / f"{output_name(root, path)}.txt"
+            if not args.force and output.exists() and manifest.is_done(document, pipeline, digest):
+                skipped += 1
+                continue
+            tasks.append((path, document, pipeline, digest))
+
+    print(f"{len(tasks)} task(s) to run, {skipped} already done.")
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = {
+            executor.submit(_run_task, root, path, pipeline, args, output_root): (document, pipeline, digest)
+            for path, document, pipeline, digest in tasks
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            document, pipeline, digest = futures[future]
+            try:
+                file_path = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(tasks)}] {pipeline:9} {document}: Error: {e}")
+                continue
+            manifest.mark_done(document, pipeline, digest)
+            print(f"[{done}/{len(tasks)}] {pipeline:9} {document} -> {file_path}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="folder of PDF/DOCX/TXT files (searched recursively)")
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(PIPELINES), default=["summary", "notes"])
+    parser.add_argument("--concurrency", type=int, default=4, help=f"documents processed at once; long summaries share {MAX_CONCURRENT_CHUNKS} chunk calls between them")
+    parser.add_argument("--output", default=".", help="folder that receives the generated_* directories")
+    parser.add_argument("--length", type=int, choices=[20, 30, 45], default=30, help="summary length in percent")
+    parser.add_argument("--custom-prompt", default="", help="instructions used instead of the default prompts")
+    parser.add_argument("--questions", type=int, default=10, help="number of questions to predict")
+    parser.add_argument("--question-type", default="Short Answer",
+                        choices=["Multiple Choice", "Short Answer", "Long Answer"])
+    parser.add_argument("--no-cache", action="store_true", help="ignore cached AI responses")
+    parser.add_argument("--force", action="store_true", help="re-run documents that are already done")
+    args = parser.parse_args(argv)
+
+    if not Path(args.directory).is_dir():
+        parser.error(f"{args.directory} is not a directory")
+    return 1 if run_batch(args) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# ----------------- Cache Location -----------------
+CACHE_ROOT = Path(os.getenv("SUMNOTES_CACHE_DIR", ".sumnotes_cache"))
+
+
+def content_hash(data):
+    """
+    Returns the SHA-256 hex digest of the given bytes (or str).
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+# ----------------- In-Memory LRU -----------------
+class LRUCache:
+    """
+    A small thread-safe LRU mapping bounded by number of entries.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+# ----------------- On-Disk Store -----------------
+class DiskStore:
+    """
+    A directory of files keyed by hex digest, bounded by total size.
+    Reads refresh a file's mtime so eviction removes the least recently used entries.
+    Writes go through a temporary file so concurrent workers never see partial data.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, suffix=".bin"):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return False
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += len(data)
+            needs_scan = self._approx_bytes is None or self._approx_bytes > self.max_bytes
+        if needs_scan:
+            self._evict()
+        return True
+
+    def file(self, key, data):
+        """
+        Returns the path of key's file, writing data to it first if it is not
+        stored yet, or None if it cannot be written. Worker processes can open
+        the path instead of being sent the bytes.
+        """
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            if not self.put(key, data):
+                return None
+        return str(path)
+
+    def delete(self, key):
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.directory.glob(f"*/*{self.suffix}"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        path.unlink()
+                        total -= size
+                    except OSError:
+                        pass
+            self._approx_bytes = total
@@ -0,0 +1,242 @@
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+
+from sumnotes import scheduler
+from sumnotes.chunking import estimate_tokens
+
+# ----------------- Call Layer Configuration -----------------
+# Every Gemini request in the app runs on one background event loop, so the
+# in-flight cap below applies to the whole process, not to each page or session.
+MAX_IN_FLIGHT = int(os.getenv("SUMNOTES_MAX_IN_FLIGHT", "16"))
+MAX_RETRIES = int(os.getenv("SUMNOTES_MAX_RETRIES", "5"))
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+DEFAULT_DEADLINE = float(os.getenv("SUMNOTES_CALL_DEADLINE", "300"))
+STREAM_GRACE = 5.0
+
+# Rate limiting and transient server errors are retried; anything else is not.
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class ModelCallError(Exception):
+    """
+    Raised when a model call fails for good: a non-retryable error, retries
+    exhausted, or the call's deadline passed.
+    """
+
+
+def is_retryable(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)
+    if isinstance(code, tuple):
+        code = code[0]
+    return code in RETRYABLE_CODES
+
+
+def backoff_delay(attempt):
+    # "Full jitter": spreads retries out so bursts of 429s don't retry in lockstep
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+# ----------------- Background Event Loop -----------------
+_loop = None
+_semaphore = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop, _semaphore
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="sumnotes-calls", daemon=True).start()
+            _semaphore = asyncio.run_coroutine_threadsafe(_make_semaphore(), loop).result()
+            _loop = loop
+        return _loop
+
+
+async def _make_semaphore():
+    return asyncio.Semaphore(MAX_IN_FLIGHT)
+
+
+def current_session_id():
+    """
+    Identifies the Streamlit session making a call (used for fair queuing);
+    outside Streamlit, each thread counts as its own session.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+    except Exception:
+        pass
+    return threading.current_thread().name
+
+
+def estimate_call_tokens(prompt, chat_session=None):
+    text = prompt if isinstance(prompt, str) else str(prompt)
+    tokens = estimate_tokens(text)
+    for message in getattr(chat_session, "history", None) or []:
+        tokens += estimate_tokens(str(message))
+    return tokens
+
+
+def queue_depths():
+    return scheduler.queue_depths()
+
+
+def run(coroutine):
+    """
+    Runs a coroutine on the shared call loop and blocks until it finishes.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_loop()).result()
+
+
+async def call_with_retries(make_call, deadline=DEFAULT_DEADLINE, retries=MAX_RETRIES,
+                            model_name=None, tokens=0, session_id=None):
+    """
+    Awaits make_call() under the process-wide concurrency cap, retrying
+    rate-limit and server errors with jittered exponential backoff until the
+    call succeeds, retries run out or the deadline (in seconds) passes.
+    When model_name has a quota, every attempt first waits its turn in that
+    model's scheduler, so excess work queues instead of hitting 429s.
+    """
+    quota = scheduler.get_scheduler(model_name) if model_name else None
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + deadline
+    attempt = 0
+    while True:
+        remaining = give_up_at - loop.time()
+        if remaining <= 0:
+            raise ModelCallError(f"Model call did not finish within {deadline:g}s")
+        try:
+            if quota is not None:
+                await asyncio.wait_for(quota.acquire(tokens, session_id), timeout=remaining)
+                remaining = give_up_at - loop.time()
+            async with _semaphore:
+                return await asyncio.wait_for(make_call(), timeout=remaining)
+        except Exception as e:
+            if not is_retryable(e):
+                raise ModelCallError(str(e)) from e
+            if attempt >= retries:
+                raise ModelCallError(f"Model call failed after {attempt + 1} attempts: {e}") from e
+            delay = min(backoff_delay(attempt), max(0.0, give_up_at - loop.time()))
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+# ----------------- Gemini Calls -----------------
+async def generate_async(model, prompt, deadline=DEFAULT_DEADLINE, session_id=None, **kwargs):
+    return await call_with_retries(
+        lambda: model.generate_content_async(prompt, **kwargs), deadline,
+        model_name=model.model_name, tokens=estimate_call_tokens(prompt), session_id=session_id,
+    )
+
+
+async def send_message_async(chat_session, prompt, deadline=DEFAULT_DEADLINE, session_id=None, **kwargs):
+    return await call_with_retries(
+        lambda: chat_session.send_message_async(prompt, **kwargs), deadline,
+        model_name=chat_session.model.model_name,
+        tokens=estimate_call_tokens(prompt, chat_session), session_id=session_id,
+    )
+
+
+def generate(model, prompt, deadline=DEFAULT_DEADLINE, session_id=None, **kwargs):
+    """
+    Blocking model.generate_content(prompt) routed through the shared call layer.
+    """
+    session_id = session_id or current_session_id()
+    return run(generate_async(model, prompt, deadline, session_id, **kwargs))
+
+
+def send_message(chat_session, prompt, deadline=DEFAULT_DEADLINE, session_id=None, **kwargs):
+    """
+    Blocking chat_session.send_message(prompt) routed through the shared call layer.
+    """
+    session_id = session_id or current_session_id()
+    return run(send_message_async(chat_session, prompt, deadline, session_id, **kwargs))
+
+
+_DONE = object()
+
+
+def _stream(make_call, model_name, tokens, deadline, session_id):
+    # The deadline covers the whole stream, not just opening it, so a stalled
+    # stream fails with ModelCallError instead of hanging the caller.
+    chunks = queue.Queue()
+
+    async def pump():
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + deadline
+        try:
+            response = await call_with_retries(
+                make_call, deadline, model_name=model_name, tokens=tokens, session_id=session_id,
+            )
+            async with _semaphore:
+                response_chunks = response.__aiter__()
+                while True:
+                    remaining = give_up_at - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    try:
+                        chunk = await asyncio.wait_for(response_chunks.__anext__(), timeout=remaining)
+                    except StopAsyncIteration:
+                        break
+                    chunks.put(chunk)
+            chunks.put(_DONE)
+        except asyncio.TimeoutError:
+            chunks.put(ModelCallError(f"Model stream did not finish within {deadline:g}s"))
+        except ModelCallError as e:
+            chunks.put(e)
+        except Exception as e:
+            chunks.put(ModelCallError(str(e)))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_loop())
+    # The pump reports its own timeout; this only guards against it never reporting
+    give_up_at = time.monotonic() + deadline + STREAM_GRACE
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=max(0.0, give_up_at - time.monotonic()))
+            except queue.Empty:
+                raise ModelCallError(f"Model stream did not finish within {deadline:g}s")
+            if item is _DONE:
+                return
+            if isinstance(item, ModelCallError):
+                raise item
+            yield item
+    finally:
+        future.cancel()
+
+
+def stream(model, prompt, deadline=DEFAULT_DEADLINE, session_id=None, **kwargs):
+    """
+    Yields the chunks of a streamed model.generate_content(prompt, stream=True).
+    Opening the stream is retried like any other call; once chunks have started
+    arriving, errors are raised to the caller as ModelCallError, as is a stream
+    that is still running when the deadline passes.
+    """
+    return _stream(
+        lambda: model.generate_content_async(prompt, stream=True, **kwargs),
+        model.model_name, estimate_call_tokens(prompt), deadline, session_id or current_session_id(),
+    )
+
+
+def stream_message(chat_session, prompt, deadline=DEFAULT_DEADLINE, session_id=None, **kwargs):
+    """
+    Yields the chunks of a streamed chat_session.send_message(prompt, stream=True),
+    with the same retry and error behaviour as stream().
+    """
+    return _stream(
+        lambda: chat_session.send_message_async(prompt, stream=True, **kwargs),
+        chat_session.model.model_name, estimate_call_tokens(prompt, chat_session),
+        deadline, session_id or current_session_id(),
+    )
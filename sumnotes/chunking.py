@@ -0,0 +1,109 @@
+import re
+
+# Rough characters-per-token ratio for English prose, used for budgeting prompts.
+CHARS_PER_TOKEN = 4
+
+_HEADING = re.compile(
+    r"^(#{1,6}\s+\S|(chapter|section|unit|part|lesson)\b|\d+(\.\d+)*\.?\s+[A-Z]|[A-Z][A-Z0-9 ,:'-]{3,60}$)",
+    re.IGNORECASE,
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def is_heading(line):
+    line = line.strip()
+    return 0 < len(line) <= 80 and bool(_HEADING.match(line))
+
+
+def _blocks(text):
+    """
+    Splits text into paragraphs, starting a new block at blank lines and headings.
+    """
+    blocks = []
+    current = []
+    for line in text.splitlines():
+        if not line.strip() or is_heading(line):
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            if line.strip():
+                current.append(line)
+            continue
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def split_sentences(text):
+    """
+    Splits text into sentences. Headings and paragraph breaks also end a sentence.
+    """
+    sentences = []
+    for block in _blocks(text):
+        lines = block.splitlines()
+        if is_heading(lines[0]):
+            sentences.append(lines[0].strip())
+            lines = lines[1:]
+        body = " ".join(" ".join(lines).split())
+        sentences.extend(sentence for sentence in _SENTENCE_END.split(body) if sentence)
+    return sentences
+
+
+def _split_long(block, max_chars):
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_END.split(block):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text, max_chars):
+    """
+    Splits text into chunks of at most max_chars, preferring to break at headings,
+    then paragraph boundaries, then sentence ends. A chunk that is at least half
+    full is closed at the next heading so sections are kept together.
+    """
+    chunks = []
+    current = []
+    size = 0
+
+    def flush():
+        nonlocal current, size
+        if current:
+            chunks.append("\n\n".join(current))
+        current = []
+        size = 0
+
+    for block in _blocks(text):
+        if len(block) > max_chars:
+            flush()
+            chunks.extend(_split_long(block, max_chars))
+            continue
+        if size + len(block) + 2 > max_chars or (is_heading(block.split("\n", 1)[0]) and size >= max_chars // 2):
+            flush()
+        current.append(block)
+        size += len(block) + 2
+    flush()
+    return chunks
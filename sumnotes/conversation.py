@@ -0,0 +1,134 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sumnotes import calls
+from sumnotes.chunking import CHARS_PER_TOKEN, estimate_tokens
+
+# ----------------- Conversation Defaults -----------------
+DEFAULT_TOKEN_BUDGET = 8000
+SUMMARY_WORDS = 200
+CLIP_MARKER = " [...]"
+# Compaction calls the model, so it runs here rather than on the request path
+_compactor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sumnotes-compact")
+
+
+class Conversation:
+    """
+    Per-session chat history kept within a token budget.
+
+    The most recent turns are sent to the model verbatim. When they exceed
+    token_budget, the oldest user/model pairs are evicted; if a compact callable
+    is given, evicted turns are folded into a rolling summary in the background,
+    so older context survives in condensed form instead of being dropped. A
+    single turn longer than half the turn budget is clipped when it is added.
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, compact=None):
+        self.token_budget = token_budget
+        self.compact = compact
+        self.turns = []
+        self.summary = ""
+        self._pending = []
+        self._compacting = False
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _budgets(self):
+        # With compaction, a quarter of the budget is reserved for the summary
+        summary_budget = self.token_budget // 4 if self.compact else 0
+        return summary_budget, self.token_budget - summary_budget
+
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(turn["text"]) for turn in self.turns)
+
+    def add(self, role, text):
+        # Clipped, marker included, to at most half the turn budget, so a whole
+        # exchange of two clipped turns still fits
+        max_turn_chars = (self._budgets()[1] // 2 - 1) * CHARS_PER_TOKEN
+        if len(text) > max_turn_chars:
+            text = text[:max(0, max_turn_chars - len(CLIP_MARKER))] + CLIP_MARKER
+        self.turns.append({"role": role, "text": text})
+        if role == "model":
+            self._fit()
+
+    def add_exchange(self, user_text, model_text):
+        self.add("user", user_text)
+        self.add("model", model_text)
+
+    def clear(self):
+        with self._lock:
+            self.turns = []
+            self.summary = ""
+            self._pending = []
+            # A compaction still running for the old history must not restore it
+            self._generation += 1
+
+    def _fit(self):
+        turn_budget = self._budgets()[1]
+        evicted = []
+        while self.turns and sum(estimate_tokens(turn["text"]) for turn in self.turns) > turn_budget:
+            # Evict whole exchanges so the history always starts with a user turn
+            evicted.extend(self.turns[:2])
+            self.turns = self.turns[2:]
+        if evicted and self.compact:
+            with self._lock:
+                self._pending.extend(evicted)
+                start = not self._compacting
+                self._compacting = True
+            if start:
+                _compactor.submit(self._compact_pending)
+
+    def _compact_pending(self):
+        # Folds evicted turns into the summary until none are left; turns evicted
+        # while the model call runs are picked up by the next pass.
+        max_summary_chars = self._budgets()[0] * CHARS_PER_TOKEN
+        while True:
+            with self._lock:
+                turns, self._pending = self._pending, []
+                if not turns:
+                    self._compacting = False
+                    return
+                summary, generation = self.summary, self._generation
+            try:
+                summary = self.compact(summary, turns)[-max_summary_chars:]
+            except Exception:
+                continue
+            with self._lock:
+                if generation == self._generation:
+                    self.summary = summary
+
+    def history(self):
+        """
+        Returns the history in Gemini's chat format, led by the rolling summary if any.
+        """
+        with self._lock:
+            summary, turns = self.summary, list(self.turns)
+        messages = []
+        if summary:
+            messages.append({"role": "user", "parts": [f"Summary of our earlier conversation: {summary}"]})
+            messages.append({"role": "model", "parts": ["Understood, I'll keep that in mind."]})
+        for turn in turns:
+            messages.append({"role": turn["role"], "parts": [turn["text"]]})
+        return messages
+
+
+def model_compactor(model, max_words=SUMMARY_WORDS):
+    """
+    Returns a compact(summary, turns) callable that uses model to fold old turns
+    into a short rolling summary.
+    """
+    def compact(summary, turns):
+        transcript = "\n".join(f"{turn['role']}: {turn['text']}" for turn in turns)
+        prompt = f"""
+        Update the running summary of a conversation with the new exchanges below.
+        Keep facts, names, topics and decisions the assistant may need later.
+        Reply with the updated summary only, in at most {max_words} words.
+
+        Current summary: {summary or "(none)"}
+
+        New exchanges:
+        {transcript}
+        """
+        return calls.generate(model, prompt).text.strip()
+
+    return compact
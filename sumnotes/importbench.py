@@ -0,0 +1,91 @@
+"""
+Cold-start import benchmark for the Streamlit pages.
+
+Runs each page's top-level imports in a fresh interpreter, reports how long they
+take and fails if a page exceeds its time budget or pulls in one of the heavy
+OCR/voice libraries at load time (those must be imported on first use).
+Libraries that Streamlit or the Gemini SDK load anyway (google.generativeai
+imports Pillow, for instance) are measured once and not held against pages.
+
+    python -m sumnotes.importbench [--budget SECONDS] [--repeat N]
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES_DIR = ROOT / "pages"
+
+HEAVY_MODULES = ["cv2", "numpy", "pytesseract", "tesserocr", "pdf2image", "PIL", "speech_recognition", "pyttsx3", "gtts"]
+DEFAULT_BUDGET = 2.0
+# Every page needs these, so whatever they import is not the page's doing
+BASELINE_IMPORTS = "import streamlit\nimport google.generativeai"
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def page_imports(path):
+    """
+    Returns the source of the page's module-level import statements.
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    return "\n".join(
+        ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def measure(imports, repeat, name):
+    code = _PROBE.format(imports=imports, heavy=HEAVY_MODULES)
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"{name}: {result.stderr.strip().splitlines()[-1]}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return min(run["seconds"] for run in runs), runs[0]["heavy"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds allowed per page")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page (the fastest is reported)")
+    args = parser.parse_args(argv)
+
+    try:
+        _, baseline = measure(BASELINE_IMPORTS, 1, "baseline")
+    except RuntimeError as e:
+        print(f"ERROR  {e}")
+        return 1
+    if baseline:
+        print(f"Already imported by streamlit/google.generativeai (ignored): {', '.join(baseline)}")
+
+    failed = False
+    for path in sorted(PAGES_DIR.glob("*.py")):
+        try:
+            seconds, heavy = measure(page_imports(path), args.repeat, path.name)
+        except RuntimeError as e:
+            print(f"ERROR  {e}")
+            failed = True
+            continue
+        heavy = [name for name in heavy if name not in baseline]
+        ok = seconds <= args.budget and not heavy
+        failed = failed or not ok
+        note = f"  eagerly imports: {', '.join(heavy)}" if heavy else ""
+        print(f"{'ok' if ok else 'SLOW':5}  {path.name:28} {seconds:6.3f}s{note}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+import io
+import json
+import os
+import threading
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import docx
+import PyPDF2
+
+from sumnotes.cache import CACHE_ROOT, DiskStore, LRUCache, content_hash
+from sumnotes.workers import WorkerPool
+
+# ----------------- Cache Configuration -----------------
+# Documents are keyed by the SHA-256 of the uploaded bytes, so the same textbook
+# uploaded from different sessions (or pages) is only ever parsed once.
+MEMORY_DOCUMENTS = int(os.getenv("SUMNOTES_DOCUMENT_CACHE_SIZE", "16"))
+SPILL_BYTES = int(os.getenv("SUMNOTES_DOCUMENT_SPILL_BYTES", str(256 * 1024 * 1024)))
+
+# Ranges shorter than PARALLEL_MIN_PAGES are extracted serially; larger ones are
+# sharded across a process pool so extraction is not bound to a single core.
+PDF_WORKERS = int(os.getenv("SUMNOTES_PDF_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_MIN_PAGES = int(os.getenv("SUMNOTES_PARALLEL_MIN_PAGES", "16"))
+# Streaming extraction uses small shards so the first pages come back quickly.
+STREAM_SHARD_PAGES = int(os.getenv("SUMNOTES_STREAM_SHARD_PAGES", "4"))
+# PDFs handed to worker processes are written here once, by content hash, so
+# workers open a path instead of being sent the whole file with every shard.
+PDF_FILE_BYTES = int(os.getenv("SUMNOTES_PDF_FILE_BYTES", str(1024 * 1024 * 1024)))
+
+_memory = LRUCache(max_entries=MEMORY_DOCUMENTS)
+_spill = DiskStore(CACHE_ROOT / "documents", max_bytes=SPILL_BYTES, suffix=".json")
+_pdf_files = DiskStore(CACHE_ROOT / "pdfs", max_bytes=PDF_FILE_BYTES, suffix=".pdf")
+# Readers opened in this (worker) process, by PDF path
+_readers = LRUCache(max_entries=2)
+
+
+class Document:
+    """
+    Extracted text of one uploaded file, stored as an ordered list of units
+    (pages for PDFs, paragraphs for DOCX). PDF pages are filled in lazily.
+    """
+
+    def __init__(self, digest, kind, unit_count, units=None):
+        self.digest = digest
+        self.kind = kind
+        self.unit_count = unit_count
+        self.units = units if units is not None else {}
+        self.lock = threading.Lock()
+
+    def missing(self, start, end):
+        return [index for index in range(start, end) if index not in self.units]
+
+    def text_units(self, start, end):
+        return [self.units[index] for index in range(start, end)]
+
+    def to_json(self):
+        return json.dumps({
+            "kind": self.kind,
+            "unit_count": self.unit_count,
+            "units": {str(index): text for index, text in self.units.items()},
+        }).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, digest, data):
+        payload = json.loads(data.decode("utf-8"))
+        units = {int(index): text for index, text in payload["units"].items()}
+        return cls(digest, payload["kind"], payload["unit_count"], units)
+
+
+# ----------------- Upload Helpers -----------------
+def read_upload(file):
+    """
+    Returns the raw bytes of a Streamlit upload, file object, path or bytes.
+    """
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if isinstance(file, (str, Path)):
+        return Path(file).read_bytes()
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    position = file.tell()
+    file.seek(0)
+    data = file.read()
+    file.seek(position)
+    return data
+
+
+def _store(document):
+    _memory.put(document.digest, document)
+    _spill.put(document.digest, document.to_json())
+
+
+def _lookup(digest):
+    document = _memory.get(digest)
+    if document is not None:
+        return document
+    data = _spill.get(digest)
+    if data is None:
+        return None
+    try:
+        document = Document.from_json(digest, data)
+    except (ValueError, KeyError):
+        _spill.delete(digest)
+        return None
+    _memory.put(digest, document)
+    return document
+
+
+# ----------------- PDF -----------------
+def _open_pdf(data):
+    return PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def _worker_reader(source):
+    # source is a path from pdf_file(), or the PDF bytes if it could not be written
+    if not isinstance(source, str):
+        return _open_pdf(source)
+    reader = _readers.get(source)
+    if reader is None:
+        reader = PyPDF2.PdfReader(source)
+        _readers.put(source, reader)
+    return reader
+
+
+def _extract_pdf_shard(source, indices):
+    reader = _worker_reader(source)
+    return {index: reader.pages[index].extract_text() or "" for index in indices}
+
+
+_pool = WorkerPool(PDF_WORKERS)
+
+
+def _shard(indices, size):
+    return [indices[i:i + size] for i in range(0, len(indices), size)]
+
+
+def pdf_file(digest, data):
+    """
+    Returns what to send a worker process for PDF data with content hash digest:
+    the path of a copy on disk, written once per content, or the bytes themselves
+    if that copy cannot be written.
+    """
+    return _pdf_files.file(digest, data) or data
+
+
+def load_pdf(data):
+    """
+    Returns (document, data) for PDF bytes; document.digest is their content hash.
+    """
+    digest = content_hash(data)
+    document = _lookup(digest)
+    if document is None:
+        document = Document(digest, "pdf", len(_open_pdf(data).pages))
+        _store(document)
+    return document, data
+
+
+def _normalize_range(page_range, page_count):
+    if not page_range:
+        return 0, page_count
+    start, end = page_range
+    if start < 1 or end > page_count or start > end:
+        raise ValueError(f"Page range {start}-{end} is outside 1-{page_count}")
+    return start - 1, end
+
+
+def get_pdf_page_count(file):
+    """
+    Returns the number of pages in a PDF, parsing the file at most once per content hash.
+    """
+    document, _ = load_pdf(read_upload(file))
+    return document.unit_count
+
+
+def get_pdf_pages(file, page_range=None, parallel=None):
+    """
+    Returns the text of each page in the 1-based inclusive page_range (all pages if None).
+    Only pages that have never been extracted for this content are parsed; parallel
+    forces (True) or disables (False) the process pool, None decides by range size.
+    """
+    return [text for _, text in iter_pdf_pages(file, page_range, parallel)]
+
+
+def extract_pdf_text(file, page_range=None, separator="\n", parallel=None):
+    return separator.join(get_pdf_pages(file, page_range, parallel))
+
+
+def _stream_missing(data, digest, missing, parallel):
+    if parallel is None:
+        parallel = PDF_WORKERS > 1 and len(missing) >= PARALLEL_MIN_PAGES
+    if not parallel:
+        reader = _open_pdf(data)
+        for index in missing:
+            yield index, reader.pages[index].extract_text() or ""
+        return
+    futures = []
+    yielded = set()
+    try:
+        source = pdf_file(digest, data)
+        pool = _pool.get()
+        futures = [pool.submit(_extract_pdf_shard, source, shard) for shard in _shard(missing, STREAM_SHARD_PAGES)]
+        # Yield shards strictly in page order, each as soon as it is ready.
+        for future in futures:
+            wait([future])
+            pages = future.result()
+            for index in sorted(pages):
+                yielded.add(index)
+                yield index, pages[index]
+    except (BrokenProcessPool, OSError) as e:
+        # OSError: the on-disk copy was evicted before a worker opened it
+        if isinstance(e, BrokenProcessPool):
+            _pool.reset()
+        yield from _stream_missing(data, digest, [index for index in missing if index not in yielded], False)
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def iter_pdf_pages(file, page_range=None, parallel=None):
+    """
+    Yields (page_number, text) for each page in page_range, in order, as soon as
+    each page is available. Cached pages are yielded immediately, and newly
+    extracted pages are added to the document cache even if the caller stops early.
+    """
+    document, data = load_pdf(read_upload(file))
+    yield from iter_document_pages(document, data, page_range, parallel)
+
+
+def iter_document_pages(document, data, page_range=None, parallel=None):
+    """
+    Like iter_pdf_pages, for a document and data returned by load_pdf, so a
+    caller that also needs document.digest hashes the PDF only once.
+    """
+    start, end = _normalize_range(page_range, document.unit_count)
+    with document.lock:
+        missing = document.missing(start, end)
+    pending = _stream_missing(data, document.digest, missing, parallel)
+    missing = set(missing)
+    extracted = False
+    try:
+        for index in range(start, end):
+            if index in missing:
+                _, text = next(pending)
+                with document.lock:
+                    document.units[index] = text
+                extracted = True
+            yield index + 1, document.units[index]
+    finally:
+        pending.close()
+        if extracted:
+            with document.lock:
+                _store(document)
+
+
+# ----------------- DOCX -----------------
+def get_docx_paragraphs(file):
+    """
+    Returns the paragraph texts of a DOCX file, cached by content hash.
+    """
+    data = read_upload(file)
+    digest = content_hash(data)
+    document = _lookup(digest)
+    if document is None:
+        paragraphs = [para.text for para in docx.Document(io.BytesIO(data)).paragraphs]
+        document = Document(digest, "docx", len(paragraphs), dict(enumerate(paragraphs)))
+        _store(document)
+    return document.text_units(0, document.unit_count)
+
+
+def extract_docx_text(file, separator="\n"):
+    return separator.join(get_docx_paragraphs(file))
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+
+from sumnotes import calls
+from sumnotes.cache import CACHE_ROOT, DiskStore, content_hash
+
+# ----------------- Response Cache Configuration -----------------
+RESPONSE_CACHE_BYTES = int(os.getenv("SUMNOTES_RESPONSE_CACHE_BYTES", str(128 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = int(os.getenv("SUMNOTES_RESPONSE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+
+
+def normalize_prompt(prompt):
+    """
+    Collapses whitespace so prompts that differ only in indentation share a cache entry.
+    """
+    return " ".join(prompt.split())
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of model responses keyed by model name, generation config
+    and normalized prompt. Entries expire after ttl seconds and the store is
+    bounded by size, evicting the least recently used responses first.
+    """
+
+    def __init__(self, directory, max_bytes=RESPONSE_CACHE_BYTES, ttl=RESPONSE_CACHE_TTL):
+        self.store = DiskStore(directory, max_bytes=max_bytes, suffix=".json")
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name, generation_config, prompt):
+        return content_hash(json.dumps({
+            "model": model_name,
+            "config": generation_config or {},
+            "prompt": normalize_prompt(prompt),
+        }, sort_keys=True))
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        data = self.store.get(key)
+        if data is not None:
+            try:
+                entry = json.loads(data.decode("utf-8"))
+                if time.time() - entry["created"] <= self.ttl:
+                    self._count(True)
+                    return entry["text"]
+            except (ValueError, KeyError):
+                pass
+            self.store.delete(key)
+        self._count(False)
+        return None
+
+    def put(self, key, text):
+        if text:
+            self.store.put(key, json.dumps({"created": time.time(), "text": text}).encode("utf-8"))
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+response_cache = ResponseCache(CACHE_ROOT / "responses")
+
+
+# ----------------- Gemini Response Helpers -----------------
+def iter_response_text(response):
+    """
+    Yields the text of each chunk of a streamed Gemini response, skipping chunks
+    that carry no text (e.g. thinking or safety metadata).
+    """
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
+
+def generate_text(model, prompt, generation_config=None, use_cache=True, session_id=None):
+    """
+    Returns model.generate_content(prompt).text, served from the response cache
+    when an identical request was made before. Pass use_cache=False to force a
+    fresh response (which still refreshes the cache). Misses go through the
+    shared call layer and raise calls.ModelCallError on failure.
+    """
+    key = ResponseCache.key(model.model_name, generation_config, prompt)
+    if use_cache:
+        text = response_cache.get(key)
+        if text is not None:
+            return text
+    text = calls.generate(model, prompt, session_id=session_id).text
+    response_cache.put(key, text)
+    return text
+
+
+def stream_text(model, prompt, generation_config=None, use_cache=True):
+    """
+    Streaming counterpart of generate_text. A cached response is yielded in one
+    piece; otherwise chunks are yielded as they arrive and the assembled text is
+    cached once the stream completes.
+    """
+    key = ResponseCache.key(model.model_name, generation_config, prompt)
+    if use_cache:
+        text = response_cache.get(key)
+        if text is not None:
+            yield text
+            return
+    parts = []
+    for text in iter_response_text(calls.stream(model, prompt)):
+        parts.append(text)
+        yield text
+    response_cache.put(key, "".join(parts))
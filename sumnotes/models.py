@@ -0,0 +1,81 @@
+import os
+import threading
+
+import google.generativeai as genai
+import streamlit as st
+
+# ----------------- API Configuration -----------------
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "Your API Key")
+
+# ----------------- Model Roles -----------------
+# Each page asks for a model by what it is used for rather than building its own.
+MODEL_ROLES = {
+    # Long-form writing: summaries, notes, exam questions, doubt answers
+    "study": {
+        "model_name": "gemini-2.0-flash-thinking-exp-01-21",
+        "generation_config": {
+            "temperature": 1.7,
+            "top_p": 0.95,
+            "top_k": 64,
+            "max_output_tokens": 65535,
+            "response_mime_type": "text/plain",
+        },
+    },
+    # Structured mind map output
+    "mind_map": {
+        "model_name": "gemini-2.0-pro-exp-02-05",
+        "generation_config": {
+            "temperature": 1.6,
+            "top_p": 0.95,
+            "top_k": 64,
+            "max_output_tokens": 8192,
+            "response_mime_type": "application/json",
+        },
+    },
+    # Fast conversational replies for AI Buddy
+    "chat": {
+        "model_name": "gemini-1.5-flash",
+        "generation_config": {},
+    },
+}
+
+
+class ModelRegistry:
+    """
+    Owns the process-wide Gemini configuration and hands out one model per role.
+    genai.configure() resets the library's cached API clients, so it is called
+    once here instead of on every page load or request; models built afterwards
+    share those clients and their open connections.
+    """
+
+    def __init__(self, api_key=GEMINI_API_KEY, roles=MODEL_ROLES):
+        genai.configure(api_key=api_key)
+        self.roles = roles
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, role):
+        with self._lock:
+            if role not in self._models:
+                spec = self.roles[role]
+                self._models[role] = genai.GenerativeModel(
+                    model_name=spec["model_name"],
+                    generation_config=spec["generation_config"] or None,
+                )
+            return self._models[role]
+
+    def generation_config(self, role):
+        return dict(self.roles[role]["generation_config"])
+
+
+@st.cache_resource(show_spinner=False)
+def get_registry():
+    return ModelRegistry()
+
+
+def get_model(role):
+    return get_registry().model(role)
+
+
+def get_generation_config(role):
+    return get_registry().generation_config(role)
@@ -0,0 +1,414 @@
+import io
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import streamlit as st
+
+from sumnotes import ingestion, ocr_engines
+from sumnotes.cache import CACHE_ROOT, DiskStore, LRUCache, content_hash
+from sumnotes.workers import WorkerPool
+
+# OpenCV, NumPy, Pillow and Tesseract are only imported when OCR is first used,
+# so pages that never OCR anything do not pay for loading them. Tesseract itself
+# is configured in sumnotes/ocr_engines.py.
+
+# ----------------- PDF OCR Configuration -----------------
+OCR_WORKERS = int(os.getenv("SUMNOTES_OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_DPI = int(os.getenv("SUMNOTES_OCR_DPI", "300"))
+# Pages whose text layer has fewer non-whitespace characters than this are
+# treated as scanned and sent through OCR.
+MIN_TEXT_LAYER_CHARS = int(os.getenv("SUMNOTES_MIN_TEXT_LAYER_CHARS", "20"))
+
+# ----------------- Image Scaling -----------------
+# Images are resized so a typical glyph is about TARGET_GLYPH_HEIGHT pixels tall,
+# roughly what 10-12pt print scanned at 300 DPI gives Tesseract. Large phone
+# photos of big handwriting shrink a lot; tiny screenshots are enlarged a little.
+TARGET_GLYPH_HEIGHT = int(os.getenv("SUMNOTES_OCR_GLYPH_HEIGHT", "30"))
+MIN_SCALE = 0.2
+MAX_SCALE = 2.0
+# Glyph height is estimated on a copy no larger than this on its long side
+ANALYSIS_SIDE = 1600
+THUMBNAIL_SIDE = int(os.getenv("SUMNOTES_THUMBNAIL_SIDE", "800"))
+THUMBNAIL_QUALITY = 80
+
+# ----------------- Text Region Detection -----------------
+# Blocks smaller than this (in pixels) are treated as noise
+MIN_REGION_AREA = 200
+MIN_REGION_HEIGHT = 8
+REGION_PADDING = 8
+# When detected regions cover more than this fraction of the image, cropping
+# saves little, so the whole image is OCR'd in one pass instead. The same goes
+# for images with more than MAX_REGIONS regions.
+MAX_REGION_COVERAGE = 0.6
+MAX_REGIONS = 32
+
+# ----------------- OCR Cache -----------------
+# OCR text is cached on disk by image content plus everything that affects the
+# result, so the same worksheet is only OCR'd once. The store is plain files, so
+# pool workers and app processes share it. Bump PREPROCESS_VERSION whenever
+# preprocess_image changes.
+OCR_CACHE_BYTES = int(os.getenv("SUMNOTES_OCR_CACHE_BYTES", str(64 * 1024 * 1024)))
+PREPROCESS_VERSION = "otsu-dilate3x3-regions-glyphscale-v4"
+
+ocr_cache = DiskStore(CACHE_ROOT / "ocr", max_bytes=OCR_CACHE_BYTES, suffix=".txt")
+_thumbnails = LRUCache(max_entries=32)
+
+
+def ocr_cache_key(digest, *params):
+    """
+    Returns the cache key for OCR of the image or PDF with content hash digest
+    under the current preprocessing and Tesseract settings; params adds e.g.
+    page number and DPI.
+    """
+    # Every setting that changes the text: preprocessing, backend, binary,
+    # language data and Tesseract options
+    settings = "|".join(str(part) for part in (
+        PREPROCESS_VERSION, TARGET_GLYPH_HEIGHT, ocr_engines.backend(), ocr_engines.TESSERACT_CMD,
+        ocr_engines.TESSDATA_DIR, ocr_engines.TESSERACT_CONFIG, ocr_engines.OCR_LANG,
+    ) + params)
+    return content_hash(digest + "|" + settings)
+
+
+def _cached_text(key):
+    data = ocr_cache.get(key)
+    return data.decode("utf-8") if data is not None else None
+
+
+def _init_worker():
+    # Each worker OCRs one page at a time; stop Tesseract from also spreading
+    # every page over all cores, which oversubscribes the CPU. For the same
+    # reason a worker OCRs the regions of its page one at a time.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    ocr_engines.engine_pool.size = 1
+
+
+_pool = WorkerPool(OCR_WORKERS, initializer=_init_worker)
+
+
+# ----------------- OCR Processing -----------------
+class OCRProcessor:
+    @staticmethod
+    def preprocess_image(image):
+        import cv2
+        import numpy as np
+
+        np_image = np.array(image.convert("RGB"))
+        gray = cv2.cvtColor(np_image, cv2.COLOR_RGB2GRAY)
+        gray = OCRProcessor.normalize_scale(gray)
+        # Apply Otsu's thresholding
+        gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        # Dilate to connect text components
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        gray = cv2.dilate(gray, kernel, iterations=1)
+        return gray
+
+    @staticmethod
+    def estimate_glyph_height(gray):
+        """
+        Returns the median height in pixels of character-sized ink blobs in a
+        grayscale image, or None if no text-like blobs are found.
+        """
+        import cv2
+        import numpy as np
+
+        height, width = gray.shape[:2]
+        factor = min(1.0, ANALYSIS_SIDE / max(height, width))
+        if factor < 1.0:
+            gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+        ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+        count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        heights = stats[1:count, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:count, cv2.CC_STAT_WIDTH]
+        # Keep blobs shaped like characters: not specks, not rules or borders
+        glyphs = heights[(heights >= 3) & (heights < gray.shape[0] / 4) & (widths < heights * 4)]
+        if len(glyphs) < 5:
+            return None
+        return float(np.median(glyphs)) / factor
+
+    @staticmethod
+    def normalize_scale(gray):
+        """
+        Resizes a grayscale image so its text is about TARGET_GLYPH_HEIGHT pixels tall.
+        """
+        import cv2
+
+        glyph_height = OCRProcessor.estimate_glyph_height(gray)
+        if not glyph_height:
+            return gray
+        scale = min(MAX_SCALE, max(MIN_SCALE, TARGET_GLYPH_HEIGHT / glyph_height))
+        if 0.9 <= scale <= 1.2:
+            return gray
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
+    @staticmethod
+    def find_text_regions(binary):
+        """
+        Returns padded bounding boxes (x, y, w, h) of the text blocks in a
+        binarized image (dark text on a light background), in reading order.
+        """
+        import cv2
+
+        height, width = binary.shape[:2]
+        ink = cv2.bitwise_not(binary)
+        # Smear ink sideways (and a little downwards) so characters merge into
+        # lines and neighbouring lines into blocks.
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, width // 60), max(5, height // 200)))
+        blocks = cv2.dilate(ink, kernel, iterations=2)
+        contours, _ = cv2.findContours(blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        regions = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h < MIN_REGION_AREA or h < MIN_REGION_HEIGHT:
+                continue
+            left, top = max(0, x - REGION_PADDING), max(0, y - REGION_PADDING)
+            right, bottom = min(width, x + w + REGION_PADDING), min(height, y + h + REGION_PADDING)
+            regions.append((left, top, right - left, bottom - top))
+        return OCRProcessor.reading_order(regions, width)
+
+    @staticmethod
+    def reading_order(regions, width):
+        """
+        Sorts regions for reading. Regions wider than half the page (titles,
+        headers, full-width paragraphs) split it into horizontal sections; within
+        a section, narrower regions are read column by column, top to bottom.
+        """
+        wide = sorted((region for region in regions if region[2] > width / 2), key=lambda region: region[1])
+        narrow = [region for region in regions if region[2] <= width / 2]
+        ordered = []
+        top = float("-inf")
+        for divider in wide + [None]:
+            bottom = divider[1] if divider else float("inf")
+            section = sorted((region for region in narrow if top <= region[1] < bottom), key=lambda region: region[0])
+            # Regions whose horizontal extents overlap share a column band
+            bands, band_right = [], -1
+            for region in section:
+                if region[0] >= band_right:
+                    bands.append([])
+                bands[-1].append(region)
+                band_right = max(band_right, region[0] + region[2])
+            for band in bands:
+                ordered.extend(sorted(band, key=lambda region: (region[1], region[0])))
+            if divider:
+                ordered.append(divider)
+                top = bottom
+        return ordered
+
+    @staticmethod
+    def segmentation_mode(crop):
+        """
+        Picks a Tesseract page segmentation mode for a cropped region by counting
+        its lines of ink: one short run is a word, one long run a line.
+        """
+        rows = (crop < 128).any(axis=1)
+        lines = int(rows[0]) + int((rows[1:] & ~rows[:-1]).sum())
+        if lines > 1:
+            return ocr_engines.PSM_BLOCK
+        height, width = crop.shape[:2]
+        return ocr_engines.PSM_WORD if width < 4 * height else ocr_engines.PSM_LINE
+
+    @staticmethod
+    def mask_regions(binary, regions):
+        """
+        Returns binary cropped to the bounding box of regions, with everything
+        outside the regions themselves set to background.
+        """
+        import numpy as np
+
+        left = min(x for x, _, _, _ in regions)
+        top = min(y for _, y, _, _ in regions)
+        right = max(x + w for x, _, w, _ in regions)
+        bottom = max(y + h for _, y, _, h in regions)
+        masked = np.full((bottom - top, right - left), 255, dtype=binary.dtype)
+        for x, y, w, h in regions:
+            masked[y - top:y - top + h, x - left:x - left + w] = binary[y:y + h, x:x + w]
+        return masked
+
+    @staticmethod
+    def ocr_image(image):
+        """
+        Preprocesses a PIL image and returns its text and the processed image.
+        Only detected text regions are OCR'd, concurrently, each with its own
+        segmentation mode; text-dense images, and images where no region is
+        found, are OCR'd whole. The CLI backend starts a tesseract process per
+        call, so it OCRs the regions in one pass with the rest of the image blanked.
+        """
+        processed_image = OCRProcessor.preprocess_image(image)
+        height, width = processed_image.shape[:2]
+        regions = OCRProcessor.find_text_regions(processed_image)
+        if (
+            not regions
+            or len(regions) > MAX_REGIONS
+            or sum(w * h for _, _, w, h in regions) > MAX_REGION_COVERAGE * width * height
+        ):
+            return ocr_engines.image_to_string(processed_image), processed_image
+        if ocr_engines.backend() != "tesserocr":
+            return ocr_engines.image_to_string(OCRProcessor.mask_regions(processed_image, regions)), processed_image
+
+        def ocr_region(region):
+            x, y, w, h = region
+            crop = processed_image[y:y + h, x:x + w]
+            return ocr_engines.image_to_string(crop, OCRProcessor.segmentation_mode(crop)).strip()
+
+        with ThreadPoolExecutor(max_workers=ocr_engines.engine_pool.size) as executor:
+            texts = list(executor.map(ocr_region, regions))
+        return "\n".join(text for text in texts if text), processed_image
+
+    @staticmethod
+    def process_image(image_file):
+        """
+        Returns (text, processed_image) for an uploaded image. Results come from
+        the OCR cache when the same image was OCR'd before, in which case
+        processed_image is None.
+        """
+        from PIL import Image, ImageOps
+
+        try:
+            data = ingestion.read_upload(image_file)
+            key = ocr_cache_key(content_hash(data))
+            text = _cached_text(key)
+            if text is not None:
+                return text, None
+            # Phone photos are often stored sideways with an EXIF rotation tag
+            image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+            text, processed_image = OCRProcessor.ocr_image(image)
+            ocr_cache.put(key, text.encode("utf-8"))
+            return text, processed_image
+        except Exception as e:
+            st.error(f"Error processing image: {e}")
+            return None, None
+
+
+def make_thumbnail(image_file, max_side=THUMBNAIL_SIDE):
+    """
+    Returns a JPEG preview of an uploaded image no larger than max_side pixels
+    on its long side, so previews don't send full-resolution photos to the browser.
+    """
+    from PIL import Image, ImageOps
+
+    data = ingestion.read_upload(image_file)
+    key = (content_hash(data), max_side)
+    thumbnail = _thumbnails.get(key)
+    if thumbnail is None:
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+        image.thumbnail((max_side, max_side))
+        output = io.BytesIO()
+        image.convert("RGB").save(output, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+        thumbnail = output.getvalue()
+        _thumbnails.put(key, thumbnail)
+    return thumbnail
+
+
+# ----------------- PDF OCR -----------------
+def _ocr_pdf_page(source, digest, page_num, dpi):
+    """
+    Rasterizes and OCRs one PDF page. Runs in a worker process; source is what
+    ingestion.pdf_file returned, usually a path, so no bytes are copied per page.
+    """
+    key = ocr_cache_key(digest, page_num, dpi)
+    text = _cached_text(key)
+    if text is None:
+        from pdf2image import convert_from_bytes, convert_from_path
+
+        convert = convert_from_path if isinstance(source, str) else convert_from_bytes
+        images = convert(source, dpi=dpi, first_page=page_num, last_page=page_num)
+        text, _ = OCRProcessor.ocr_image(images[0])
+        ocr_cache.put(key, text.encode("utf-8"))
+    return page_num, text
+
+
+# ----------------- Hybrid Text Layer + OCR -----------------
+def has_text_layer(text):
+    return len("".join(text.split())) >= MIN_TEXT_LAYER_CHARS
+
+
+def can_ocr_pdf():
+    """
+    Returns True if scanned pages can be OCR'd here: a Tesseract backend is
+    available and poppler's pdftoppm is on PATH for rasterizing.
+    """
+    return ocr_engines.available() and shutil.which("pdftoppm") is not None
+
+
+def _submit_ocr(source, digest, page_num, dpi):
+    if OCR_WORKERS == 1:
+        return None
+    try:
+        return _pool.get().submit(_ocr_pdf_page, source, digest, page_num, dpi)
+    except BrokenProcessPool:
+        _pool.reset()
+        return None
+
+
+def _ocr_result(future, source, digest, page_num, dpi, fallback):
+    # A page that fails to OCR keeps whatever its text layer had
+    try:
+        if future is not None:
+            try:
+                return future.result()[1]
+            except BrokenProcessPool:
+                _pool.reset()
+        return _ocr_pdf_page(source, digest, page_num, dpi)[1]
+    except Exception:
+        return fallback
+
+
+def iter_pdf_text(pdf_file, page_range=None, dpi=OCR_DPI):
+    """
+    Yields (page_number, text) for each page in page_range, in page order. Pages
+    with a usable text layer are read directly; only text-less (scanned) pages
+    are rasterized and OCR'd, in the process pool while later pages are read.
+    Without an OCR backend, or when OCR of a page fails, the page's text layer
+    is used as is.
+    """
+    # The PDF is hashed once, and written to disk at most once, for all its pages
+    document, data = ingestion.load_pdf(ingestion.read_upload(pdf_file))
+    digest = document.digest
+    source = None
+    use_ocr = can_ocr_pdf()
+    order = []
+    ready = {}
+    layers = {}
+    futures = {}
+    try:
+        for page_num, text in ingestion.iter_document_pages(document, data, page_range):
+            order.append(page_num)
+            if has_text_layer(text) or not use_ocr:
+                ready[page_num] = text
+            else:
+                cached = _cached_text(ocr_cache_key(digest, page_num, dpi))
+                if cached is not None:
+                    ready[page_num] = cached
+                else:
+                    layers[page_num] = text
+                    if source is None:
+                        source = ingestion.pdf_file(digest, data)
+                    futures[page_num] = _submit_ocr(source, digest, page_num, dpi)
+            # Yield everything up to the first page still waiting on OCR
+            while order and order[0] in ready:
+                page_num = order.pop(0)
+                yield page_num, ready.pop(page_num)
+        for page_num in order:
+            if page_num in ready:
+                yield page_num, ready.pop(page_num)
+            else:
+                yield page_num, _ocr_result(futures.pop(page_num), source, digest, page_num, dpi, layers.pop(page_num))
+    finally:
+        for future in futures.values():
+            if future is not None:
+                future.cancel()
+
+
+def extract_pdf_text(pdf_file, page_range=None, separator="\n", dpi=OCR_DPI, on_page=None):
+    """
+    Returns the text of the page range, using OCR only for scanned pages;
+    on_page(page_number, text) is called as each page becomes available.
+    """
+    pages = []
+    for page_num, text in iter_pdf_text(pdf_file, page_range, dpi):
+        pages.append(text)
+        if on_page:
+            on_page(page_num, text)
+    return separator.join(pages)
@@ -0,0 +1,154 @@
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+
+# ----------------- Tesseract Configuration -----------------
+# SUMNOTES_TESSERACT_CMD overrides the binary; otherwise the one on PATH is used,
+# falling back to the default Windows install location.
+TESSERACT_CMD = (
+    os.getenv("SUMNOTES_TESSERACT_CMD")
+    or shutil.which("tesseract")
+    or r"C:/Program Files/Tesseract-OCR/tesseract.exe"
+)
+TESSDATA_DIR = os.getenv("SUMNOTES_TESSDATA_DIR")
+OCR_LANG = os.getenv("SUMNOTES_OCR_LANG", "eng")
+TESSERACT_CONFIG = '--oem 3 --psm 6'
+# Page segmentation modes: a uniform block of text, a single line, a single word
+PSM_BLOCK, PSM_LINE, PSM_WORD = 6, 7, 8
+
+# "tesserocr" keeps Tesseract loaded in-process, "cli" runs the tesseract binary
+# for every image, "auto" picks tesserocr when it is installed.
+OCR_BACKEND = os.getenv("SUMNOTES_OCR_BACKEND", "auto")
+# Engines kept per process; each one holds its own copy of the language data.
+OCR_ENGINES = int(os.getenv("SUMNOTES_OCR_ENGINES", str(min(4, os.cpu_count() or 1))))
+
+
+class TesseractCLIEngine:
+    """
+    Runs the tesseract binary through pytesseract, one process per image.
+    """
+
+    name = "cli"
+
+    def __init__(self):
+        import pytesseract
+
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+        self._pytesseract = pytesseract
+
+    def image_to_string(self, image, psm=PSM_BLOCK):
+        config = TESSERACT_CONFIG.replace(f"--psm {PSM_BLOCK}", f"--psm {psm}")
+        if TESSDATA_DIR:
+            config += f' --tessdata-dir "{TESSDATA_DIR}"'
+        return self._pytesseract.image_to_string(image, lang=OCR_LANG, config=config)
+
+
+class TesserocrEngine:
+    """
+    An in-process Tesseract instance; the language data is loaded once, when
+    the engine is created, and reused for every image.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        from tesserocr import OEM, PSM, PyTessBaseAPI
+
+        kwargs = {"path": TESSDATA_DIR} if TESSDATA_DIR else {}
+        # Same settings as TESSERACT_CONFIG: default engine, single block of text
+        self.api = PyTessBaseAPI(lang=OCR_LANG, psm=PSM.SINGLE_BLOCK, oem=OEM.DEFAULT, **kwargs)
+
+    def image_to_string(self, image, psm=PSM_BLOCK):
+        from PIL import Image
+
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        self.api.SetPageSegMode(psm)
+        self.api.SetImage(image)
+        return self.api.GetUTF8Text()
+
+
+def _engine_class():
+    if OCR_BACKEND == "cli":
+        return TesseractCLIEngine
+    if OCR_BACKEND == "tesserocr":
+        return TesserocrEngine
+    try:
+        import tesserocr  # noqa: F401
+    except ImportError:
+        return TesseractCLIEngine
+    return TesserocrEngine
+
+
+def available():
+    """
+    Returns True if the configured OCR backend can run here: tesserocr is
+    installed, or the tesseract binary exists.
+    """
+    if _engine_class() is TesserocrEngine:
+        try:
+            import tesserocr  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    return shutil.which(TESSERACT_CMD) is not None
+
+
+def backend():
+    """
+    Returns the name of the OCR backend in use, "tesserocr" or "cli".
+    """
+    return _engine_class().name
+
+
+class EnginePool:
+    """
+    Up to size OCR engines, created on demand and lent to one caller at a time
+    (Tesseract instances are not thread-safe).
+    """
+
+    def __init__(self, size=OCR_ENGINES):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self):
+        engine = self._take()
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def _take(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        try:
+            return _engine_class()()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+
+engine_pool = EnginePool()
+
+
+def image_to_string(image, psm=PSM_BLOCK):
+    """
+    OCRs a preprocessed image with an engine borrowed from this process's pool,
+    using Tesseract page segmentation mode psm.
+    """
+    with engine_pool.borrow() as engine:
+        return engine.image_to_string(image, psm)
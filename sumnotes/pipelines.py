@@ -0,0 +1,110 @@
+from pathlib import Path
+
+from sumnotes import calls
+from sumnotes.llm import generate_text, stream_text
+from sumnotes.models import get_generation_config, get_model
+from sumnotes.summarize import MAX_CONCURRENT_CHUNKS, SINGLE_PROMPT_CHARS, map_reduce_summary
+
+# Generation pipelines shared by the Streamlit pages and the batch CLI. These
+# raise on failure (calls.ModelCallError for model errors); the pages report
+# exceptions with st.error instead of saving them as output.
+
+# ----------------- Output Locations -----------------
+SUMMARY_DIR = Path("generated_summaries")
+NOTES_DIR = Path("generated_notes")
+QUESTIONS_DIR = Path("generated_questions")
+
+MODEL_ROLE = "study"
+
+
+def _generate(prompt, use_cache=True, session_id=None):
+    return generate_text(
+        get_model(MODEL_ROLE), prompt, get_generation_config(MODEL_ROLE),
+        use_cache=use_cache, session_id=session_id,
+    )
+
+
+def _stream(prompt, use_cache=True):
+    return stream_text(get_model(MODEL_ROLE), prompt, get_generation_config(MODEL_ROLE), use_cache=use_cache)
+
+
+def save_output(text, directory, filename):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    file_path = directory / f"{filename}.txt"
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return file_path
+
+
+# ----------------- Summaries -----------------
+def build_summary_prompt(text, summary_length, custom_prompt=""):
+    default_prompt = f"""
+    Please summarize the following text, focusing on the main points and key takeaways.
+    The summary should be approximately {summary_length}% of the original text.
+    """
+
+    prompt = custom_prompt if custom_prompt else default_prompt
+
+    prompt += f"\n\nText to summarize: {text}"
+    return prompt
+
+
+def summarize(text, summary_length, custom_prompt="", on_progress=None, use_cache=True,
+              max_workers=MAX_CONCURRENT_CHUNKS):
+    if len(text) > SINGLE_PROMPT_CHARS:
+        # Too long for one prompt: summarize chunks concurrently, then merge.
+        # Chunk calls run on worker threads, so they are queued under the caller's session.
+        session_id = calls.current_session_id()
+        generate = lambda prompt: _generate(prompt, use_cache=use_cache, session_id=session_id)
+        return map_reduce_summary(text, summary_length, generate, custom_prompt,
+                                  max_workers=max_workers, on_progress=on_progress)
+    return _generate(build_summary_prompt(text, summary_length, custom_prompt), use_cache=use_cache)
+
+
+def stream_summary(text, summary_length, custom_prompt="", use_cache=True):
+    """
+    Yields the summary text chunk by chunk as the model produces it.
+    """
+    yield from _stream(build_summary_prompt(text, summary_length, custom_prompt), use_cache=use_cache)
+
+
+# ----------------- Notes -----------------
+def build_notes_prompt(text, custom_prompt=""):
+    default_prompt = """
+    Please analyze this book chapter and create comprehensive notes. Include:
+    1. Main themes and key concepts
+    2. Important points and arguments
+    3. Notable quotes or passages
+    4. Summary of the chapter
+    5. Key takeaways
+    """
+    prompt = custom_prompt if custom_prompt else default_prompt
+    prompt += f"\n\nChapter content: {text}"
+    return prompt
+
+
+def make_notes(text, custom_prompt="", use_cache=True):
+    return _generate(build_notes_prompt(text, custom_prompt), use_cache=use_cache)
+
+
+def stream_notes(text, custom_prompt="", use_cache=True):
+    """
+    Yields the notes text chunk by chunk as the model produces it.
+    """
+    yield from _stream(build_notes_prompt(text, custom_prompt), use_cache=use_cache)
+
+
+# ----------------- Exam Questions -----------------
+def build_questions_prompt(subject, topics, num_questions, question_type, custom_prompt=None):
+    if custom_prompt:
+        return custom_prompt
+    return f"""
+        You are an AI exam predictor. Generate {num_questions} {question_type} exam questions for the subject: {subject}.
+        Focus on the following topics: {topics}.
+        """
+
+
+def make_questions(subject, topics, num_questions, question_type, custom_prompt=None, use_cache=True):
+    prompt = build_questions_prompt(subject, topics, num_questions, question_type, custom_prompt)
+    return _generate(prompt, use_cache=use_cache)
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+
+# ----------------- Model Quotas -----------------
+# Requests and tokens per minute allowed for each model. Override with
+# SUMNOTES_MODEL_QUOTAS='{"gemini-1.5-flash": {"rpm": 60, "tpm": 2000000}}'.
+MODEL_QUOTAS = {
+    "gemini-2.0-flash-thinking-exp-01-21": {"rpm": 10, "tpm": 4000000},
+    "gemini-2.0-pro-exp-02-05": {"rpm": 2, "tpm": 1000000},
+    "gemini-1.5-flash": {"rpm": 15, "tpm": 1000000},
+}
+MODEL_QUOTAS.update(json.loads(os.getenv("SUMNOTES_MODEL_QUOTAS", "{}")))
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to capacity tokens and refills continuously
+    at rate tokens per second.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount):
+        """
+        Seconds until amount tokens are available (0 if they are now).
+        Requests larger than the bucket only wait for a full bucket.
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def consume(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class ModelScheduler:
+    """
+    Admits calls to one model within its requests- and tokens-per-minute
+    buckets. Waiting calls are queued per session and admitted round-robin
+    across sessions, so one busy session cannot starve the others.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm, rpm / 60)
+        self.tokens = TokenBucket(tpm, tpm / 60)
+        self.queues = OrderedDict()
+        self._dispatcher = None
+
+    def depth(self):
+        return sum(len(waiters) for waiters in self.queues.values())
+
+    async def acquire(self, tokens, session_id):
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(session_id, deque()).append((future, tokens))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        # Runs while anything is queued; acquire() restarts it when needed
+        while self.queues:
+            session_id, waiters = next(iter(self.queues.items()))
+            future, tokens = waiters[0]
+            if future.done():
+                # The caller gave up (deadline or cancellation) while queued
+                waiters.popleft()
+            else:
+                delay = max(self.requests.time_until(1), self.tokens.time_until(tokens))
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+                waiters.popleft()
+                future.set_result(None)
+            if waiters:
+                self.queues.move_to_end(session_id)
+            else:
+                del self.queues[session_id]
+
+
+_schedulers = {}
+
+
+def normalize_model_name(model_name):
+    return model_name.split("/", 1)[1] if model_name.startswith("models/") else model_name
+
+
+def get_scheduler(model_name):
+    """
+    Returns the scheduler for a model, or None if it has no configured quota.
+    """
+    model_name = normalize_model_name(model_name)
+    if model_name not in MODEL_QUOTAS:
+        return None
+    if model_name not in _schedulers:
+        quota = MODEL_QUOTAS[model_name]
+        _schedulers[model_name] = ModelScheduler(quota["rpm"], quota["tpm"])
+    return _schedulers[model_name]
+
+
+def queue_depths():
+    """
+    Returns the number of calls currently waiting for quota, per model.
+    """
+    return {model_name: scheduler.depth() for model_name, scheduler in list(_schedulers.items())}
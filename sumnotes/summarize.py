@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sumnotes.calls import ModelCallError
+from sumnotes.chunking import count_words, split_into_chunks
+
+# ----------------- Map-Reduce Configuration -----------------
+# Texts longer than SINGLE_PROMPT_CHARS are summarized chunk by chunk.
+SINGLE_PROMPT_CHARS = 60000
+CHUNK_CHARS = 40000
+MAX_CONCURRENT_CHUNKS = 8
+
+
+def _chunk_prompt(chunk, length_percentage, custom_prompt, index, total):
+    instructions = custom_prompt if custom_prompt else f"""
+    Please summarize the following text, focusing on the main points and key takeaways.
+    The summary should be approximately {length_percentage}% of the original text.
+    """
+    return (
+        f"{instructions}\n\nThis is part {index} of {total} of a longer document. "
+        f"Aim for about {max(1, count_words(chunk) * length_percentage // 100)} words."
+        f"\n\nText to summarize: {chunk}"
+    )
+
+
+def _merge_prompt(parts, target_words, custom_prompt):
+    joined = "\n\n---\n\n".join(parts)
+    prompt = f"""
+    The following are summaries of consecutive sections of one document, in order.
+    Merge them into a single coherent summary, removing repetition and keeping the
+    original order of ideas. The merged summary should be about {target_words} words.
+    """
+    if custom_prompt:
+        prompt += f"\nFollow these original instructions as well: {custom_prompt}\n"
+    return prompt + f"\n\nSection summaries:\n\n{joined}"
+
+
+def _group(parts, max_chars):
+    groups = []
+    current = []
+    size = 0
+    for part in parts:
+        if current and size + len(part) > max_chars:
+            groups.append(current)
+            current = []
+            size = 0
+        current.append(part)
+        size += len(part)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _run_all(executor, generate, prompts, stage, on_progress):
+    futures = [executor.submit(generate, prompt) for prompt in prompts]
+    try:
+        for done, future in enumerate(as_completed(futures), start=1):
+            future.result()
+            if on_progress:
+                on_progress(stage, done, len(futures))
+    except Exception:
+        # One failed call fails the summary; don't start the chunks still queued
+        for future in futures:
+            future.cancel()
+        raise
+    return [future.result() for future in futures]
+
+
+def map_reduce_summary(text, length_percentage, generate, custom_prompt="",
+                       chunk_chars=CHUNK_CHARS, max_workers=MAX_CONCURRENT_CHUNKS, on_progress=None):
+    """
+    Summarizes text of any size: chunks are summarized concurrently with generate(prompt),
+    then adjacent summaries are merged level by level while they fit in one prompt.
+    When the requested summary is itself too long for one call, the merged sections
+    are returned in order instead of being compressed further.
+    on_progress(stage, done, total) is called from the calling thread after each call.
+    The first failed call is raised without waiting for the calls still running,
+    and ModelCallError is raised if every summary comes back empty.
+    """
+    chunks = split_into_chunks(text, chunk_chars)
+    target_words = max(1, count_words(text) * length_percentage // 100)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        prompts = [
+            _chunk_prompt(chunk, length_percentage, custom_prompt, index, len(chunks))
+            for index, chunk in enumerate(chunks, start=1)
+        ]
+        # Empty summaries carry nothing to merge
+        parts = [part for part in _run_all(executor, generate, prompts, "map", on_progress) if part.strip()]
+
+        while len(parts) > 1:
+            groups = _group(parts, chunk_chars)
+            if len(groups) == len(parts):
+                break
+            total_chars = max(1, sum(len(part) for part in parts))
+            prompts = [
+                _merge_prompt(group, max(1, target_words * sum(len(p) for p in group) // total_chars), custom_prompt)
+                for group in groups
+            ]
+            parts = [part for part in _run_all(executor, generate, prompts, "reduce", on_progress) if part.strip()]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not parts:
+        raise ModelCallError("The model returned an empty summary for every part of the document")
+    return "\n\n".join(parts)
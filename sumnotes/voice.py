@@ -0,0 +1,539 @@
+import base64
+import json
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from io import BytesIO
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from sumnotes.cache import CACHE_ROOT, DiskStore, content_hash
+from sumnotes.chunking import split_sentences
+
+# gTTS, pyttsx3 and SpeechRecognition are only imported when voice features are
+# first used, so typing a question never waits on them.
+
+# ----------------- TTS Audio Cache -----------------
+# Synthesized speech is cached on disk by text and voice settings, so answers
+# that were spoken before start playing without another round of synthesis.
+TTS_CACHE_BYTES = int(os.getenv("SUMNOTES_TTS_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+tts_cache = DiskStore(CACHE_ROOT / "tts", max_bytes=TTS_CACHE_BYTES, suffix=".audio")
+
+# ----------------- TTS Pipeline Configuration -----------------
+# Answers are spoken segment by segment: the first segment is a single sentence
+# so playback starts quickly, later ones group sentences up to SEGMENT_CHARS.
+SEGMENT_CHARS = 300
+# gTTS segments synthesized at once (network bound); pyttsx3 always uses one
+TTS_WORKERS = int(os.getenv("SUMNOTES_TTS_WORKERS", "4"))
+# Seconds to wait for the shared pyttsx3 engine, including time queued behind others
+PYTTSX3_TIMEOUT = 120
+# While an answer is streaming, later segments wait for at least this much text
+STREAM_SEGMENT_CHARS = 80
+# Longest wait for one segment's audio before speech is abandoned
+SEGMENT_TIMEOUT = 60
+
+_MARKDOWN = re.compile(r"[*_#`>|~]+")
+
+
+def tts_cache_key(engine, text, lang="en", rate=1.0):
+    return content_hash(f"{engine}|{lang}|{rate:g}|{content_hash(text)}")
+
+
+def _gtts_bytes(text, lang="en"):
+    key = tts_cache_key("gtts", text, lang)
+    audio_bytes = tts_cache.get(key)
+    if audio_bytes is None:
+        from gtts import gTTS
+
+        tts = gTTS(text=text, lang=lang, slow=False)
+        fp = BytesIO()
+        tts.write_to_fp(fp)
+        audio_bytes = fp.getvalue()
+        tts_cache.put(key, audio_bytes)
+    return audio_bytes
+
+
+class Pyttsx3Worker:
+    """
+    A thread that owns one initialized pyttsx3 engine and renders queued
+    requests one at a time, since pyttsx3 engines are not thread-safe and are
+    slow to initialize.
+    """
+
+    def __init__(self):
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sumnotes-pyttsx3", daemon=True)
+        self._thread.start()
+
+    def synthesize(self, text, rate_multiplier, timeout=PYTTSX3_TIMEOUT):
+        """
+        Returns WAV bytes for text spoken at rate_multiplier times the default rate.
+        """
+        future = Future()
+        self._requests.put((text, rate_multiplier, future))
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # Still queued: the worker skips it instead of speaking for nobody
+            future.cancel()
+            raise
+
+    def _run(self):
+        try:
+            import pyttsx3
+
+            engine = pyttsx3.init()
+            default_rate = engine.getProperty('rate')  # Typically around 200 wpm
+        except Exception as e:
+            engine, error = None, e
+        # pyttsx3 can only render to a file; a directory only this worker uses
+        # means the output path can be reused without racing other processes.
+        workdir = tempfile.mkdtemp(prefix="sumnotes-tts-")
+        output_path = os.path.join(workdir, "speech.wav")
+        while True:
+            text, rate_multiplier, future = self._requests.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            if engine is None:
+                future.set_exception(error)
+                continue
+            try:
+                engine.setProperty('rate', int(default_rate * rate_multiplier))
+                engine.save_to_file(text, output_path)
+                engine.runAndWait()
+                with open(output_path, "rb") as f:
+                    future.set_result(f.read())
+                os.remove(output_path)
+            except Exception as e:
+                future.set_exception(e)
+
+
+_pyttsx3_worker = None
+_pyttsx3_lock = threading.Lock()
+
+
+def get_pyttsx3_worker():
+    global _pyttsx3_worker
+    with _pyttsx3_lock:
+        if _pyttsx3_worker is None:
+            _pyttsx3_worker = Pyttsx3Worker()
+        return _pyttsx3_worker
+
+
+def _pyttsx3_bytes(text, rate_multiplier):
+    key = tts_cache_key("pyttsx3", text, rate=rate_multiplier)
+    audio_bytes = tts_cache.get(key)
+    if audio_bytes is None:
+        audio_bytes = get_pyttsx3_worker().synthesize(text, rate_multiplier)
+        tts_cache.put(key, audio_bytes)
+    return audio_bytes
+
+
+# ----------------- Background Speech Capture -----------------
+# Silence (seconds) that ends an utterance, and the longest single utterance
+PAUSE_SECONDS = float(os.getenv("SUMNOTES_SPEECH_PAUSE", "1.2"))
+MAX_PHRASE_SECONDS = 120
+RECOGNITION_WORKERS = 4
+# The listener checks for a stop request this often while nobody is speaking
+LISTEN_POLL_SECONDS = 0.5
+# Longest a single transcription request may take
+RECOGNITION_TIMEOUT = 30
+
+_recognition_pool = ThreadPoolExecutor(max_workers=RECOGNITION_WORKERS, thread_name_prefix="sumnotes-stt")
+
+
+class SpeechCapture:
+    """
+    Listens to the microphone on a background thread. speech_recognition's
+    energy-based voice-activity detection cuts the stream into utterances at
+    pauses; each utterance is transcribed on a worker thread, and transcripts
+    are collected in the order they were spoken. Nothing here blocks the
+    Streamlit script thread until stop() is called.
+    """
+
+    def __init__(self, pause_seconds=PAUSE_SECONDS, max_phrase_seconds=MAX_PHRASE_SECONDS):
+        self.pause_seconds = pause_seconds
+        self.max_phrase_seconds = max_phrase_seconds
+        self.errors = []
+        self._results = {}
+        self._spoken = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._recognizer = None
+
+    @property
+    def listening(self):
+        return self._thread is not None and not self._stopping.is_set()
+
+    def start(self):
+        import speech_recognition as sr
+
+        if self.listening:
+            return
+        self._recognizer = sr.Recognizer()
+        self._recognizer.pause_threshold = self.pause_seconds
+        self._recognizer.operation_timeout = RECOGNITION_TIMEOUT
+        microphone = sr.Microphone()
+        with microphone as source:
+            self._recognizer.adjust_for_ambient_noise(source, duration=0.5)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, args=(microphone,), name="sumnotes-listen", daemon=True)
+        self._thread.start()
+
+    def _listen(self, microphone):
+        import speech_recognition as sr
+
+        try:
+            with microphone as source:
+                while not self._stopping.is_set():
+                    try:
+                        audio = self._recognizer.listen(
+                            source, timeout=LISTEN_POLL_SECONDS, phrase_time_limit=self.max_phrase_seconds
+                        )
+                    except sr.WaitTimeoutError:
+                        continue
+                    # A phrase still being spoken when stop was requested is
+                    # finished at the next pause and kept, not thrown away.
+                    self._on_utterance(audio)
+        except Exception as e:
+            with self._lock:
+                self.errors.append(f"Microphone error: {e}")
+
+    def _on_utterance(self, audio):
+        # Runs on the listener thread; recognition happens elsewhere so
+        # listening continues while earlier utterances are transcribed.
+        with self._lock:
+            index = self._spoken
+            self._spoken += 1
+        _recognition_pool.submit(self._recognize, index, audio)
+
+    def _recognize(self, index, audio):
+        import speech_recognition as sr
+
+        text = ""
+        try:
+            text = self._recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            pass
+        except Exception as e:
+            with self._lock:
+                self.errors.append(f"Error from speech recognition service: {e}")
+        with self._lock:
+            self._results[index] = text
+
+    def pending(self):
+        """
+        Returns the number of utterances still being transcribed.
+        """
+        with self._lock:
+            return self._spoken - len(self._results)
+
+    def transcript(self):
+        """
+        Returns the text of every utterance transcribed so far, in spoken order,
+        stopping at the first one still being transcribed.
+        """
+        with self._lock:
+            parts = []
+            for index in range(self._spoken):
+                if index not in self._results:
+                    break
+                parts.append(self._results[index])
+        return " ".join(part for part in parts if part)
+
+    def stop(self, wait=True):
+        """
+        Stops listening and returns the full transcript. With wait, the phrase
+        in progress is finished at the next pause and every utterance is
+        transcribed first (each request is bounded by RECOGNITION_TIMEOUT).
+        """
+        self._stopping.set()
+        thread, self._thread = self._thread, None
+        if not wait:
+            return self.transcript()
+        if thread is not None:
+            thread.join()
+        while self.pending():
+            time.sleep(0.1)
+        return self.transcript()
+
+
+def get_speech_capture(key="speech_capture"):
+    """
+    Returns this session's SpeechCapture, creating it on first use.
+    """
+    if key not in st.session_state:
+        st.session_state[key] = SpeechCapture()
+    return st.session_state[key]
+
+
+def discard_speech_capture(key="speech_capture"):
+    """
+    Stops and forgets this session's SpeechCapture, if any, so the microphone
+    is released when the voice input is no longer shown.
+    """
+    capture = st.session_state.pop(key, None)
+    if capture is not None:
+        capture.stop(wait=False)
+
+
+def show_live_transcript(capture, refresh_seconds=1):
+    """
+    Shows the transcript so far, refreshed in place while capture is listening.
+    """
+    fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+    def render():
+        status = "Listening..." if capture.listening else "Stopped."
+        if capture.pending():
+            status += " Transcribing..."
+        st.caption(status)
+        st.write(capture.transcript() or "_Speak now..._")
+
+    if fragment is None:
+        render()
+    else:
+        fragment(run_every=refresh_seconds)(render)()
+
+
+# ----------------- Compact Audio Encoding -----------------
+# With ffmpeg available, speech is re-encoded to low-bitrate mono and sped up on
+# the server before it is sent to the browser: pyttsx3's WAV output shrinks by
+# roughly 10x and faster speech is also shorter. Encoded audio is cached too.
+FFMPEG = os.getenv("SUMNOTES_FFMPEG") or shutil.which("ffmpeg")
+AUDIO_CODEC = os.getenv("SUMNOTES_TTS_CODEC", "mp3")
+AUDIO_CODECS = {
+    "mp3": (["-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3"], "audio/mpeg"),
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-f", "ogg"], "audio/ogg"),
+}
+
+
+def _atempo(speed):
+    # A single atempo filter only accepts factors between 0.5 and 2
+    filters = []
+    while speed > 2.0:
+        filters.append("atempo=2.0")
+        speed /= 2.0
+    filters.append(f"atempo={speed:g}")
+    return ",".join(filters)
+
+
+def compact_audio(audio_bytes, mime_type, speed=1.0):
+    """
+    Returns (audio_bytes, mime_type, playback_rate) ready to send to the
+    browser. Audio that is uncompressed or needs speeding up is encoded with
+    AUDIO_CODEC at the given speed; without ffmpeg it is returned unchanged
+    and the browser applies the speed instead.
+    """
+    if not FFMPEG or (mime_type != "audio/wav" and speed == 1.0):
+        return audio_bytes, mime_type, speed
+    codec_args, encoded_mime_type = AUDIO_CODECS[AUDIO_CODEC]
+    key = content_hash(f"encoded|{AUDIO_CODEC}|{speed:g}|{content_hash(audio_bytes)}")
+    encoded = tts_cache.get(key)
+    if encoded is None:
+        command = [FFMPEG, "-v", "error", "-i", "pipe:0", "-ac", "1"]
+        if speed != 1.0:
+            command += ["-filter:a", _atempo(speed)]
+        try:
+            result = subprocess.run(command + codec_args + ["pipe:1"], input=audio_bytes,
+                                    capture_output=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired):
+            return audio_bytes, mime_type, speed
+        if result.returncode != 0 or not result.stdout:
+            return audio_bytes, mime_type, speed
+        encoded = result.stdout
+        tts_cache.put(key, encoded)
+    return encoded, encoded_mime_type, 1.0
+
+
+# ----------------- Function to Play Audio Hidden -----------------
+# Audio is queued on a player object in the parent Streamlit page, so segments
+# embedded one after another play back to back instead of all at once.
+_PLAYER_JS = """
+const player = {queue: [], current: null};
+player.playNext = function () {
+  if (player.current || !player.queue.length) return;
+  const next = player.queue.shift();
+  const audio = new Audio(next.src);
+  audio.playbackRate = next.rate;
+  player.current = audio;
+  audio.onended = audio.onerror = function () { player.current = null; player.playNext(); };
+  audio.play().catch(audio.onended);
+};
+player.enqueue = function (src, rate, interrupt) {
+  if (interrupt) {
+    player.queue = [];
+    if (player.current) { player.current.pause(); player.current = null; }
+  }
+  player.queue.push({src: src, rate: rate});
+  player.playNext();
+};
+return player;
+"""
+
+
+def play_audio_hidden(audio_bytes, playback_rate, mime_type="audio/mp3", interrupt=True):
+    """
+    Queues the audio bytes for hidden autoplay after any audio already queued;
+    interrupt stops and clears what is playing first.
+    The playback_rate is applied via JavaScript (for gTTS/MP3).
+    For pyttsx3 (WAV), we keep playbackRate=1 because the audio is pre-rendered.
+    """
+    if audio_bytes:
+        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+        audio_html = f"""
+        <script>
+          var src = "data:{mime_type};base64,{audio_base64}";
+          try {{
+            var host = window.parent;
+            // Built in the parent page so it outlives this iframe
+            host.sumnotesPlayer = host.sumnotesPlayer || new host.Function({json.dumps(_PLAYER_JS)})();
+            host.sumnotesPlayer.enqueue(src, {playback_rate}, {str(interrupt).lower()});
+          }} catch (e) {{
+            var audio = new Audio(src);
+            audio.playbackRate = {playback_rate};
+            audio.play();
+          }}
+        </script>
+        """
+        components.html(audio_html, height=0)
+
+
+# ----------------- Sentence-Pipelined Speech -----------------
+def speech_segments(text, max_chars=SEGMENT_CHARS):
+    """
+    Splits text into speakable segments with markdown symbols removed. The
+    first segment is a single sentence; later sentences are grouped.
+    """
+    segments = []
+    for sentence in split_sentences(_MARKDOWN.sub("", text)):
+        if len(segments) > 1 and len(segments[-1]) + len(sentence) < max_chars:
+            segments[-1] += " " + sentence
+        elif sentence.strip():
+            segments.append(sentence.strip())
+    return segments
+
+
+def _synthesizer(tts_engine, voice_speed):
+    """
+    Returns (synthesize, workers): a function from a text segment to
+    (audio_bytes, mime_type, playback_rate), and how many may run at once.
+    """
+    if tts_engine == "gTTS":
+        return (lambda segment: compact_audio(_gtts_bytes(segment), "audio/mp3", voice_speed)), TTS_WORKERS
+    # pyttsx3 renders at the requested rate; requests are serialized by its worker anyway
+    return (lambda segment: compact_audio(_pyttsx3_bytes(segment, voice_speed), "audio/wav")), 1
+
+
+def iter_speech(text, tts_engine="gTTS", voice_speed=1.0):
+    """
+    Yields (audio_bytes, mime_type, playback_rate) for each segment of text in
+    order, synthesizing and encoding later segments in the background while
+    earlier ones are being played.
+    """
+    synthesize, workers = _synthesizer(tts_engine, voice_speed)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(synthesize, segment) for segment in speech_segments(text)]
+        for future in futures:
+            yield future.result(timeout=SEGMENT_TIMEOUT)
+    finally:
+        # Don't wait on a stalled synthesis; its result is no longer wanted
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def speak_text(text, tts_engine="gTTS", voice_speed=1.0):
+    """
+    Speaks text with the chosen engine, starting playback as soon as the first
+    sentence is synthesized.
+    """
+    try:
+        for index, (audio_bytes, mime_type, playback_rate) in enumerate(iter_speech(text, tts_engine, voice_speed)):
+            play_audio_hidden(audio_bytes, playback_rate, mime_type, interrupt=index == 0)
+    except Exception as e:
+        st.error(f"Error converting text to speech ({tts_engine}): {e}")
+
+
+# ----------------- Streaming Speech -----------------
+class SentenceBuffer:
+    """
+    Collects streamed text and releases speakable segments at sentence or line
+    ends. The first segment is released as soon as one sentence is complete;
+    later ones wait for at least min_chars so speech isn't chopped into tiny clips.
+    """
+
+    _BOUNDARY = re.compile(r"[.!?:](?=\s)|\n")
+
+    def __init__(self, min_chars=STREAM_SEGMENT_CHARS):
+        self.min_chars = min_chars
+        self.text = ""
+        self.released = 0
+
+    def _release(self, end):
+        segment = " ".join(_MARKDOWN.sub("", self.text[:end]).split())
+        self.text = self.text[end:]
+        if not segment:
+            return []
+        self.released += 1
+        return [segment]
+
+    def feed(self, chunk):
+        self.text += chunk
+        end = 0
+        for match in self._BOUNDARY.finditer(self.text):
+            end = match.end()
+        if end and (self.released == 0 or end >= self.min_chars):
+            return self._release(end)
+        return []
+
+    def flush(self):
+        return self._release(len(self.text))
+
+
+def speak_stream(chunks, tts_engine="gTTS", voice_speed=1.0):
+    """
+    Passes streamed text chunks through while speaking them: each completed
+    sentence is synthesized in the background and played, in order, as soon
+    as it is ready, so speech starts while the text is still being generated.
+    Must be consumed on the Streamlit script thread.
+    """
+    synthesize, workers = _synthesizer(tts_engine, voice_speed)
+    buffer = SentenceBuffer()
+    pending = deque()
+    played = 0
+    speaking = True
+
+    def play_ready(wait):
+        nonlocal played, speaking
+        while speaking and pending and (wait or pending[0].done()):
+            try:
+                audio_bytes, mime_type, playback_rate = pending.popleft().result(timeout=SEGMENT_TIMEOUT)
+            except Exception as e:
+                st.error(f"Error converting text to speech ({tts_engine}): {e}")
+                speaking = False
+                return
+            play_audio_hidden(audio_bytes, playback_rate, mime_type, interrupt=played == 0)
+            played += 1
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for chunk in chunks:
+            yield chunk
+            if speaking:
+                pending.extend(executor.submit(synthesize, segment) for segment in buffer.feed(chunk))
+                play_ready(wait=False)
+        if speaking:
+            pending.extend(executor.submit(synthesize, segment) for segment in buffer.flush())
+            play_ready(wait=True)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,35 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+class WorkerPool:
+    """
+    A lazily started, reusable process pool. Workers use the "spawn" start
+    method so they are independent of the Streamlit server's threads.
+    """
+
+    def __init__(self, max_workers, initializer=None):
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                )
+            return self._pool
+
+    def reset(self):
+        """
+        Discards a broken pool; the next get() starts a fresh one.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None